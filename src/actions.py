@@ -1,4 +1,8 @@
 class TranscriberActions:
     def __init__(self):
         self.start_transcribing = None
-        self.stop_transcribing = None
\ No newline at end of file
+        self.stop_transcribing = None
+        self.preload_model = None
+        self.export_stats = None
+        self.toggle_metrics_server = None
+        self.toggle_output_stream = None
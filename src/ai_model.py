@@ -1,14 +1,25 @@
-import torch
-import whisper
+import math
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 from logger import logger
 
+# thresholds of whisper.transcribe(): a decode above the compression ratio or below the average log probability
+# is decoded again with the temperature fallback, a segment is silence above the no speech probability
+compressionRatioThreshold = 2.4
+logprobThreshold = -1.0
+noSpeechThreshold = 0.6
+
 
 class AiModel:
     def __init__(self, model_name: str, tmp_directory: str):
         self._model_name = model_name
         self._tmp_directory = tmp_directory
         self._whisper_model = None
+        # Whisper models are not thread safe, all inference goes through this lock
+        self._lock = Lock()
 
     def load(self):
         self._load_whisper()
@@ -17,6 +28,9 @@ class AiModel:
         if self._whisper_model is None:
             if self._model_name is None:
                 raise Exception("AI model name is not configured")
+            # torch and whisper take seconds to import, so they are imported on first use
+            import torch
+            import whisper
             cuda = torch.cuda.is_available()
             logger.log(f"AiModel: loading Whisper model '{self._model_name}', (cuda: {cuda})...")
             self._whisper_model = whisper.load_model(
@@ -25,6 +39,86 @@ class AiModel:
             )
         logger.log(f"AiModel: Whisper model loaded")
 
-    def transcribe(self, data):
-        return self._whisper_model.transcribe(data)
+    def warm_up(self):
+        """Run a short dummy decode, so the first real chunk doesn't pay one-off kernel and allocator warm-up costs"""
+        from whisper.audio import SAMPLE_RATE
+        self.transcribe_batch([np.zeros(SAMPLE_RATE, dtype=np.float32)])
+        logger.log(f"AiModel: Whisper model '{self._model_name}' warmed up")
+
+    def get_memory_size(self) -> int:
+        """Bytes taken by the weights of the loaded model"""
+        if self._whisper_model is None:
+            return 0
+        tensors = list(self._whisper_model.parameters()) + list(self._whisper_model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+    def transcribe(self, data, language: Optional[str] = None, initial_prompt: Optional[str] = None):
+        """language None lets Whisper detect it, initial_prompt is the text spoken before the audio"""
+        with self._lock:
+            return self._whisper_model.transcribe(data, language=language, initial_prompt=initial_prompt)
+
+    def detect_language(self, audio: np.ndarray) -> Tuple[str, float]:
+        """Language code of the speech in the first 30 s of the audio and its probability"""
+        import whisper
+        with self._lock:
+            model = self._whisper_model
+            if not model.is_multilingual:
+                return "en", 1.0
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+            _, probabilities = model.detect_language(mel)
+        language = max(probabilities, key=probabilities.get)
+        return language, probabilities[language]
+
+    def can_transcribe_in_batch(self, audio: np.ndarray) -> bool:
+        """Only audio that fits into one 30 s mel window can be decoded in a batch"""
+        from whisper.audio import N_SAMPLES
+        return audio.shape[0] <= N_SAMPLES
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: Optional[str] = None) -> List[dict]:
+        """
+        Decode several short clips of the same language in one forward pass.
+        Whisper pads every input to a 30 s mel window anyway, so a batch costs about the same as a single clip.
+        The batch is decoded greedily, clips which fail the thresholds of transcribe() are decoded again by it.
+        Returns a result dict per clip with the same "text" key as transcribe()
+        """
+        import torch
+        import whisper
+        with self._lock:
+            model = self._whisper_model
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+                for audio in audios
+            ]).to(model.device)
+            options = whisper.DecodingOptions(language=language, fp16=model.device.type == "cuda")
+            results = whisper.decode(model, mel, options)
+
+        transcribed = []
+        for audio, result in zip(audios, results):
+            # the same silence filter whisper.transcribe() applies to each segment
+            is_silence = result.no_speech_prob > noSpeechThreshold and result.avg_logprob < logprobThreshold
+            if not is_silence and (result.compression_ratio > compressionRatioThreshold
+                                   or result.avg_logprob < logprobThreshold):
+                # repetition loops and unlikely text, transcribe() retries them at higher temperatures
+                transcribed.append(self.transcribe(audio, language))
+                continue
+            transcribed.append({
+                "text": "" if is_silence else result.text,
+                "avg_logprob": result.avg_logprob,
+                "no_speech_prob": result.no_speech_prob,
+            })
+        return transcribed
+
 
+def result_confidence(result: dict) -> Optional[float]:
+    """
+    0..1 confidence of a transcribe() or transcribe_batch() result: exp of Whisper's average token log probability,
+    weighted by segment duration when the result has segments
+    """
+    if "avg_logprob" in result:
+        return round(math.exp(result["avg_logprob"]), 4)
+    segments = [segment for segment in result.get("segments", []) if "avg_logprob" in segment]
+    if not segments:
+        return None
+    weights = [max(segment["end"] - segment["start"], 0.01) for segment in segments]
+    weighted = sum(weight * math.exp(segment["avg_logprob"]) for weight, segment in zip(weights, segments))
+    return round(weighted / sum(weights), 4)
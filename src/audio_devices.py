@@ -1,12 +1,12 @@
 from threading import Thread
 
-import sounddevice as sd
-
 from model import AudioDeviceWrapper
 from logger import logger
 
 
 def get_devices_names(include_output_devices = False):
+    # sounddevice loads the PortAudio library, so it is imported on first use
+    import sounddevice as sd
     devices = sd.query_devices()
     names = []
     for device in devices:
@@ -17,6 +17,7 @@ def get_devices_names(include_output_devices = False):
     return names
 
 def get_device_by_name(name: str) -> AudioDeviceWrapper:
+    import sounddevice as sd
     devices = sd.query_devices()
     for device in devices:
         wrapper = AudioDeviceWrapper(device)
@@ -26,6 +27,7 @@ def get_device_by_name(name: str) -> AudioDeviceWrapper:
 
 # Below is attempt to record sound from output audio device. Unfortunately it didn't work in Windows
 def find_loopback_device():
+    import sounddevice as sd
     devices = sd.query_devices()
     for idx, device in enumerate(devices):
         if device['hostapi'] == sd.default.hostapi and device['name'].lower().find('loopback') != -1:
@@ -61,6 +63,7 @@ class SystemSoundRecorder:
             # sd.wait()
             # self.callback(recording, None, None, None)
 
+        import sounddevice as sd
         try:
             with sd.InputStream(device=self.device_id,
                                 channels=self.channels,
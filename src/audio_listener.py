@@ -1,9 +1,8 @@
-import sounddevice as sd
 import numpy as np
-from queue import Queue, Empty
+from typing import Optional, Tuple, List
 from threading import Thread, Event
-import wave
 import os
+import time
 
 from model import AudioDeviceWrapper, ListenerBase, AudioInputLine
 from audio_devices import get_device_by_name, SystemSoundRecorder
@@ -12,22 +11,49 @@ from constants import deviceTypeInput
 from logger import Logger, logger
 from model import ChunkAudio
 from transcriber import Transcriber
+from recording_writer import RecordingWriter
+from ring_buffer import AudioRingBuffer
+from resampler import StreamingResampler
+from shared_input_stream import subscribe_channel, SharedInputStream
+from vad import VoiceActivityDetector
+
+# audio is captured in small blocks, so a segment can be closed at any pause and the streaming window grows smoothly
+vadBlockDuration = 0.1
+# PortAudio callback status flags, counted by the audio callback
+callbackStatusFlags = ("input_overflow", "input_underflow", "output_overflow", "output_underflow")
+# max seconds of raw audio waiting in the ring buffer between the audio callback and the listener thread
+audioBufferMaxDuration = 30
 
 
 class AudioListener(ListenerBase):
     def __init__(self, transcriber: Transcriber, config: AudioListenerConfig):
         self.transcriber = transcriber
         self.chunk_duration = config.chunk_duration
+        self.use_vad = config.use_vad and not config.streaming
+        self.streaming = config.streaming
+        self._vad: Optional[VoiceActivityDetector] = None
         self.input_line = config.input_line
         self.device_wrapper = get_device_by_name(self.input_line.device_name)
         self.stream = None
+        self._shared_stream: Optional[SharedInputStream] = None
         self.stop_event = Event()
-        self.audio_queue = Queue()
-        self.sample_rate = 16000  # Standard sample rate for speech
+        self.sample_rate = 16000  # Standard sample rate for speech, chunks are resampled to it
+        self._stream_sample_rate = self.sample_rate  # the native rate of the device
+        # preallocated when listening starts, the audio callback copies blocks in without allocating memory
+        self._audio_buffer: Optional[AudioRingBuffer] = None
+        self._resampler: Optional[StreamingResampler] = None
+        self._speech: List[np.ndarray] = []  # 16 kHz mono audio which is not sent as a chunk yet
+        self._speech_frames = 0
+        self._speech_position = 0  # position in the 16 kHz stream of the first sample in _speech
+        self._reported_dropped_frames = 0
+        # (time.time(), stream position) at the end of the newest audio block, 1 tuple so it is replaced atomically
+        self._capture_clock: Optional[Tuple[float, int]] = None
         self.listen_thread = None
         self.chunk_counter = 0
         self.recording_file = None
-        self.recording_wave = None
+        self.recording_writer: Optional[RecordingWriter] = None
+        self.status_counts = {flag: 0 for flag in callbackStatusFlags}
+        self._reported_status_counts = dict(self.status_counts)
         self._transcription_index = config.transcription_index
         self._speaker_name = config.input_line.speaker_name
             
@@ -37,8 +63,25 @@ class AudioListener(ListenerBase):
 
         if self.transcriber is None:
             raise ValueError("Transcriber not set")
+
+        if self.input_line.channel is not None:
+            if self.device_wrapper.type != deviceTypeInput:
+                raise ValueError(f"{self.device_wrapper.get_name()}: a channel can be chosen for input devices only")
+            channels = self.device_wrapper.device['max_input_channels']
+            if not 0 <= self.input_line.channel < channels:
+                raise ValueError(f"{self.device_wrapper.get_name()} has no channel {self.input_line.channel + 1},"
+                                 f" it has {channels} channels")
             
         self.stop_event.clear()
+        self._stream_sample_rate = self._get_stream_sample_rate()
+        if self.input_line.transcribe:
+            self._audio_buffer = AudioRingBuffer(
+                int(self._stream_sample_rate * max(audioBufferMaxDuration, 2 * self.chunk_duration)),
+                self._get_stream_channels()
+            )
+            self._resampler = StreamingResampler(self._stream_sample_rate, self.sample_rate)
+            # nothing is captured before this moment, lines of other speakers don't wait for earlier audio
+            self.transcriber.set_capture_watermark(time.time())
 
         # Setup recording if enabled
         if self.input_line.record:
@@ -53,74 +96,190 @@ class AudioListener(ListenerBase):
         # Create a filename with the speaker name
         filename = f"rec-{self._transcription_index}-{self._speaker_name}.wav"
         self.recording_file = os.path.join(self.transcriber.get_output_directory(), filename)
-        
-        # Create and setup the WAV file
-        self.recording_wave = wave.open(self.recording_file, 'wb')
-        self.recording_wave.setnchannels(1)  # Mono
-        self.recording_wave.setsampwidth(2)  # 2 bytes per sample (16 bits)
-        self.recording_wave.setframerate(self.sample_rate)
-
-    def _audio_callback(self, data, frames, time, status):
-        """Callback function for the audio stream."""
+        self.recording_writer = RecordingWriter(self.recording_file, self._stream_sample_rate, self._get_stream_channels())
+        self.recording_writer.start()
+
+    def _get_stream_sample_rate(self) -> int:
+        # the native rate, so the driver doesn't convert and devices without 16 kHz support can be opened
+        return int(self.device_wrapper.device['default_samplerate'])
+
+    def _get_stream_channels(self) -> int:
+        if self.input_line.channel is not None:
+            return 1
+        key = 'max_input_channels' if self.device_wrapper.type == deviceTypeInput else 'max_output_channels'
+        # more channels are usually separate speakers of a multichannel interface, they are chosen with the channel
+        return max(1, min(int(self.device_wrapper.device[key]), 2))
+
+    def _audio_callback(self, data, frames, time_info, status):
+        """Callback function for the audio stream. Runs in real time, so it only counts and hands data over"""
         if status:
-            logger.log(f'Audio callback status: {status}')
+            for flag in callbackStatusFlags:
+                if getattr(status, flag):
+                    self.status_counts[flag] += 1
         if not self.stop_event.is_set():
-            # Add to transcription queue if transcription is enabled
-            if self.input_line.transcribe:
-                self.audio_queue.put(data.copy())
+            # Add to transcription buffer if transcription is enabled
+            if self._audio_buffer is not None:
+                self._audio_buffer.write(data)
+                self._capture_clock = (time.time(), self._audio_buffer.frames_written)
 
             # Save to recording file if enabled
-            if self.input_line.record and self.recording_wave:
-                audio_int16 = (data * 32767).astype(np.int16)
-                self.recording_wave.writeframes(audio_int16.tobytes())
+            if self.recording_writer is not None:
+                self.recording_writer.write(data)
 
     def _process_audio(self):
-        if self.device_wrapper.type == deviceTypeInput:
+        if self.input_line.channel is not None:
+            self._process_audio_channel()
+        elif self.device_wrapper.type == deviceTypeInput:
             self._process_audio_input()
         else:
             self._process_audio_output()
 
+    def _process_audio_channel(self):
+        """1 channel of a stream shared with the listeners of the other channels of the same device"""
+        self._shared_stream = subscribe_channel(
+            self.device_wrapper,
+            self.input_line.channel,
+            self._stream_sample_rate,
+            int(self._stream_sample_rate * vadBlockDuration),
+            self._audio_callback
+        )
+        try:
+            self._consume_audio()
+        finally:
+            self._shared_stream.unsubscribe(self._audio_callback)
+            self._shared_stream = None
+
     def _process_audio_input(self):
+        import sounddevice as sd
         with sd.InputStream(
                 device=self.device_wrapper.device_id,
-                channels=1,
-                samplerate=self.sample_rate,
-                blocksize=int(self.sample_rate * self.chunk_duration),
+                channels=self._get_stream_channels(),
+                samplerate=self._stream_sample_rate,
+                blocksize=int(self._stream_sample_rate * vadBlockDuration),
                 callback=self._audio_callback
         ) as stream:
             self.stream = stream
-            while not self.stop_event.is_set():
-                try:
-                    audio = self.audio_queue.get(timeout=1.0)
-                    chunk = ChunkAudio(self.chunk_counter, audio)
-                    if self.input_line.transcribe:
-                        self.transcriber.transcribe_chunk_async(chunk)
-                    self.audio_queue.task_done()
-                    logger.log(f"AudioListener {self._speaker_name} chunk {self.chunk_counter}")
-                    self.chunk_counter += 1
-                except Empty:
-                    continue  # No chunks to process, continue waiting
+            self._consume_audio()
 
     def _process_audio_output(self):
+        import sounddevice as sd
         with sd.OutputStream(
                 device=self.device_wrapper.device_id,
-                channels=2,
-                samplerate=self.device_wrapper.device['default_samplerate'],
-                blocksize=int(self.device_wrapper.device['default_samplerate'] * self.chunk_duration),
+                channels=self._get_stream_channels(),
+                samplerate=self._stream_sample_rate,
+                blocksize=int(self._stream_sample_rate * vadBlockDuration),
                 callback=self._audio_callback
         ) as stream:
             self.stream = stream
-            while not self.stop_event.is_set():
-                try:
-                    audio = self.audio_queue.get(timeout=1.0)
-                    chunk = ChunkAudio(self.chunk_counter, audio)
-                    if self.input_line.transcribe:
-                        self.transcriber.transcribe_chunk_async(chunk)
-                    self.audio_queue.task_done()
-                    logger.log(f"AudioListener {self._speaker_name} chunk {self.chunk_counter}")
-                    self.chunk_counter += 1
-                except Empty:
-                    continue  # No chunks to process, continue waiting
+            self._consume_audio()
+
+    def _get_chunk_frames(self) -> int:
+        duration = vadBlockDuration if self.streaming else self.chunk_duration
+        return int(self.sample_rate * duration)
+
+    def _consume_audio(self):
+        if self.use_vad:
+            # chunk duration becomes the max length of a speech segment
+            self._vad = VoiceActivityDetector(self.sample_rate, self.chunk_duration)
+        while not self.stop_event.is_set():
+            if not self._read_audio(final=False):
+                self.stop_event.wait(vadBlockDuration / 2)  # Not enough audio yet, continue waiting
+            self._report_capture_watermark()
+            self._report_dropped_frames()
+            self._report_status_counts()
+
+    def _read_audio(self, final: bool) -> bool:
+        """Turns buffered audio into chunks. Returns False when there is not enough audio for a chunk yet"""
+        if self._audio_buffer is None:
+            return False
+        self._resample_buffered_audio()
+        if self._vad is not None:
+            if self._speech_frames == 0:
+                return False
+            for start_frame, segment in self._vad.process(self._take_speech(self._speech_frames)):
+                self._send_chunk(segment, start_frame)
+            return True
+
+        chunk_frames = self._get_chunk_frames()
+        if self._speech_frames < chunk_frames and not (final and self._speech_frames > 0):
+            return False
+        start_frame = self._speech_position
+        self._send_chunk(self._take_speech(chunk_frames), start_frame)
+        return True
+
+    def _resample_buffered_audio(self):
+        """Everything in the ring buffer to 16 kHz mono, in blocks as it arrived"""
+        available = self._audio_buffer.available()
+        if available == 0:
+            return
+        # the resampler writes into its own output, so zero-copy views are enough
+        for view in self._audio_buffer.read_views(available):
+            if view.shape[0]:
+                speech = self._resampler.process(view)
+                self._speech.append(speech)
+                self._speech_frames += speech.shape[0]
+        self._audio_buffer.advance(available)
+
+    def _take_speech(self, frames: int) -> np.ndarray:
+        speech = self._speech[0] if len(self._speech) == 1 else np.concatenate(self._speech)
+        frames = min(frames, speech.shape[0])
+        rest = speech[frames:]
+        self._speech = [rest] if rest.shape[0] else []
+        self._speech_frames = rest.shape[0]
+        self._speech_position += frames
+        return speech[:frames]
+
+    def _frame_time(self, position: int) -> Optional[float]:
+        """
+        time.time() when the frame at the position in the 16 kHz stream was captured, counted back from the newest
+        block. Frames dropped on overflow are not counted, so audio before a drop is placed a bit later than it was
+        """
+        capture_clock = self._capture_clock
+        if capture_clock is None:
+            return None
+        callback_at, frames_written = capture_clock
+        return callback_at - (frames_written / self._stream_sample_rate - position / self.sample_rate)
+
+    def _report_capture_watermark(self):
+        """Tell the transcriber when the oldest audio which is not sent as a chunk yet was captured"""
+        if self._audio_buffer is None:
+            return
+        position = self._speech_position
+        if self._vad is not None:
+            segment_start = self._vad.open_segment_start()
+            if segment_start is not None:
+                position = segment_start
+        captured_at = self._frame_time(position)
+        if captured_at is not None:
+            self.transcriber.set_capture_watermark(captured_at)
+
+    def _report_dropped_frames(self):
+        dropped_frames = self._audio_buffer.overflow_frames if self._audio_buffer is not None else 0
+        if dropped_frames != self._reported_dropped_frames:
+            self._reported_dropped_frames = dropped_frames
+            logger.error(f"AudioListener {self._speaker_name}: listener is behind, dropped audio: {dropped_frames / self._stream_sample_rate:.1f} sec")
+
+    def _report_status_counts(self):
+        if self.status_counts != self._reported_status_counts:
+            self._reported_status_counts = dict(self.status_counts)
+            logger.error(f"AudioListener {self._speaker_name}: audio stream xruns: {self._format_status_counts()}")
+
+    def _format_status_counts(self) -> str:
+        return ", ".join(f"{flag}={count}" for flag, count in self.status_counts.items())
+
+    def get_status_counts(self) -> dict:
+        """Overflow and underflow (xrun) counts reported by the audio stream"""
+        return dict(self.status_counts)
+
+    def _send_chunk(self, audio: np.ndarray, start_frame: int):
+        capture_start = self._frame_time(start_frame)
+        captured_at = self._frame_time(start_frame + audio.shape[0])
+        if captured_at is None:
+            captured_at = time.time()
+        chunk = ChunkAudio(self.chunk_counter, audio, self.sample_rate, captured_at, capture_start)
+        self.transcriber.transcribe_chunk_async(chunk)
+        logger.debug(f"AudioListener {self._speaker_name} chunk {self.chunk_counter}")
+        self.chunk_counter += 1
 
     def stop(self):
         logger.log(f"AudioListener: {self._speaker_name} stop")
@@ -141,21 +300,21 @@ class AudioListener(ListenerBase):
                 except Exception as ex:
                     logger.log(f"Error - can't stop recording system output: {ex}")
 
-        # Close recording file if it was open
-        if self.recording_wave:
-            self.recording_wave.close()
-            self.recording_wave = None
-
         if self.listen_thread is not None:
             self.listen_thread.join()
             self.listen_thread = None
 
-        # send remaining audio chunks
+        # Write the rest of the recording and close the file
+        if self.recording_writer is not None:
+            self.recording_writer.stop()
+            self.recording_writer = None
+        logger.log(f"AudioListener: {self._speaker_name} audio stream xruns: {self._format_status_counts()}")
 
-        while not self.audio_queue.empty():
-            logger.log(f"AudioListener: {self._speaker_name} process remaining chunks {self.audio_queue.qsize()}")
-            audio_chunk = self.audio_queue.get()
-            if self.input_line.transcribe:
-                self.transcriber.transcribe_chunk_async(audio_chunk)
-            self.audio_queue.task_done()
-        self.transcriber.stop()
\ No newline at end of file
+        # send remaining audio chunks
+        while self._read_audio(final=True):
+            logger.debug(f"AudioListener: {self._speaker_name} process remaining audio {self._audio_buffer.available()}")
+        if self._vad is not None:
+            segment = self._vad.flush()
+            if segment is not None:
+                self._send_chunk(segment[1], segment[0])
+        self.transcriber.stop()
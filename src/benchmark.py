@@ -0,0 +1,302 @@
+"""
+Offline benchmark of the transcription paths: real-time factor, per-chunk latency, peak RAM and word error rate.
+
+    python src/benchmark.py --configs dummy sphinx whisper:tiny whisper:base --chunk-durations 5 10 --output report.json
+
+Clips are taken from --clips (<name>.wav with the reference text in <name>.txt). Without --clips they are
+synthesized with espeak-ng, and when espeak-ng is not installed a synthetic signal without reference text is used.
+Every configuration runs in its own process, so the peak RSS of one model doesn't hide the others
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from configs import TranscriberConfig
+from constants import *
+from logger import logger
+from model import ChunkAudio, ChunkTranscribed
+from resampler import StreamingResampler
+
+sampleRate = 16000
+defaultConfigs = [recogniserDummy, recogniserSphinx, "whisper:tiny", "whisper:base"]
+
+# read by espeak-ng when no clips are given, short sentences with common words keep WER meaningful
+synthesizedSentences = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Please send the report to the team before the meeting on Friday.",
+    "We should test the new version on a slower computer first.",
+    "It is raining today, so the game will start one hour later.",
+    "Thank you for listening, let us move on to the next question.",
+]
+
+
+class _CollectingWriter:
+    """Takes the place of OutputWriter, keeps the transcribed text in memory"""
+
+    def __init__(self):
+        self.chunks: List[ChunkTranscribed] = []
+        self.started_at = time.time()
+
+    def get_output_directory(self) -> str:
+        return tempfile.gettempdir()
+
+    def register_source(self, watermark_func=None) -> int:
+        return 0
+
+    def write(self, chunk: ChunkTranscribed):
+        self.chunks.append(chunk)
+
+    def stop_source(self, source_id: int):
+        pass
+
+    def stop(self):
+        pass
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark recognisers and models on speech clips")
+    parser.add_argument("--configs", nargs="+", default=defaultConfigs,
+                        help="dummy, sphinx or whisper:<model name> (default: %(default)s)")
+    parser.add_argument("--chunk-durations", nargs="+", type=float, default=[5.0],
+                        help="seconds of audio in 1 chunk, like the live mode setting (default: %(default)s)")
+    parser.add_argument("--clips", help="directory with <name>.wav and <name>.txt reference transcripts")
+    parser.add_argument("--tmp-dir", default=os.path.join(tempfile.gettempdir(), "speech_transcriber_benchmark"),
+                        help="downloaded models (default: %(default)s)")
+    parser.add_argument("--output", default="benchmark-report.json", help="JSON report file (default: %(default)s)")
+    # used by the parent process to run 1 configuration in a child process
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def prepare_clips(directory: str) -> str:
+    """Synthesize the benchmark clips into the directory, returns the source name for the report"""
+    espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+    if espeak is not None:
+        for number, sentence in enumerate(synthesizedSentences):
+            name = os.path.join(directory, f"sentence-{number}")
+            subprocess.run([espeak, "-w", f"{name}.wav", sentence], check=True, capture_output=True)
+            with open(f"{name}.txt", "w", encoding="utf-8") as file:
+                file.write(sentence)
+        return os.path.basename(espeak)
+
+    logger.log("Benchmark: espeak-ng is not installed, using a synthetic signal without reference text")
+    _write_wav(os.path.join(directory, "synthetic.wav"), _synthetic_speech(30.0))
+    return "synthetic"
+
+
+def _synthetic_speech(duration: float) -> np.ndarray:
+    """Voice-like harmonic bursts with pauses, exercises the pipeline and the timings, but not the accuracy"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * sampleRate)) / sampleRate
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sampleRate
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 8))
+    syllables = (np.sin(2 * np.pi * 4 * t) > 0).astype(np.float32)
+    pauses = (np.sin(2 * np.pi * 0.2 * t) > -0.5).astype(np.float32)
+    audio = 0.2 * voice * syllables * pauses + 0.005 * rng.standard_normal(t.shape[0])
+    return audio.astype(np.float32)
+
+
+def _write_wav(path: str, audio: np.ndarray):
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sampleRate)
+        wav_file.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def load_clips(directory: str) -> List[Tuple[str, np.ndarray, Optional[str]]]:
+    """Returns (name, 16 kHz mono float32 audio, reference text or None) of every wav file in the directory"""
+    clips = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".wav"):
+            continue
+        path = os.path.join(directory, name)
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as file:
+                reference = file.read().strip()
+        clips.append((name, _read_wav(path), reference))
+    return clips
+
+
+def _read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16 bit wav files are supported")
+        channels = wav_file.getnchannels()
+        rate = wav_file.getframerate()
+        audio = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+    audio = audio.reshape(-1, channels).astype(np.float32) / 32768
+    # the same downmix and resampling as the live audio gets
+    return StreamingResampler(rate, sampleRate).process(audio)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> Tuple[int, int]:
+    """Returns (word edits, reference words), the Levenshtein distance over normalized words"""
+    reference_words = _normalize_words(reference)
+    hypothesis_words = _normalize_words(hypothesis)
+    previous = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, start=1):
+        current = [i] + [0] * len(hypothesis_words)
+        for j, hypothesis_word in enumerate(hypothesis_words, start=1):
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + (reference_word != hypothesis_word))
+        previous = current
+    return previous[-1], len(reference_words)
+
+
+def _normalize_words(text: str) -> List[str]:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def run_config(config_name: str, chunk_duration: float, clips_directory: str, tmp_directory: str) -> dict:
+    """Transcribe every clip chunk by chunk through Transcriber, like the live mode without VAD"""
+    import resource
+    from transcriber import Transcriber
+
+    recogniser_name, _, model_name = config_name.partition(":")
+    use_ai = recogniser_name == "whisper"
+    ai_model = None
+    load_seconds = 0.0
+    if use_ai:
+        from model_registry import ModelRegistry
+        load_started_at = time.perf_counter()
+        ai_model = ModelRegistry(modelMemoryBudgetMb).get(model_name, tmp_directory)
+        load_seconds = time.perf_counter() - load_started_at
+
+    writer = _CollectingWriter()
+    transcriber_config = TranscriberConfig(
+        recogniser_name=recogniser_name,
+        tmp_directory=tmp_directory,
+        use_ai=use_ai,
+        model_name=model_name or None,
+        transcription_index=0,
+        speaker_name=""
+    )
+    transcriber = Transcriber(writer, transcriber_config, ai_model)
+    transcriber.init()
+
+    latencies = []
+    audio_seconds = 0.0
+    edits = 0
+    reference_words = 0
+    chunk_frames = int(chunk_duration * sampleRate)
+    for name, audio, reference in load_clips(clips_directory):
+        first_chunk = len(writer.chunks)
+        for start in range(0, audio.shape[0], chunk_frames):
+            chunk_audio = ChunkAudio(len(latencies), audio[start:start + chunk_frames], sampleRate, time.time())
+            started_at = time.perf_counter()
+            transcriber.transcribe_chunk(chunk_audio)
+            latencies.append(time.perf_counter() - started_at)
+        audio_seconds += audio.shape[0] / sampleRate
+        if reference is not None:
+            hypothesis = " ".join(chunk.text for chunk in writer.chunks[first_chunk:])
+            clip_edits, clip_words = word_error_rate(reference, hypothesis)
+            edits += clip_edits
+            reference_words += clip_words
+    transcriber.stop()
+
+    processing_seconds = float(np.sum(latencies))
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if latencies else (0.0, 0.0, 0.0)
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "config": config_name,
+        "recogniser": recogniser_name,
+        "model": model_name or None,
+        "chunk_duration": chunk_duration,
+        "chunks": len(latencies),
+        "audio_seconds": round(audio_seconds, 3),
+        "processing_seconds": round(processing_seconds, 3),
+        "rtf": round(processing_seconds / audio_seconds, 4) if audio_seconds else None,
+        "latency_p50": round(float(p50), 4),
+        "latency_p90": round(float(p90), 4),
+        "latency_p99": round(float(p99), 4),
+        "load_seconds": round(load_seconds, 3),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "wer": round(edits / reference_words, 4) if reference_words else None,
+    }
+
+
+def run_in_child(config_name: str, chunk_duration: float, clips_directory: str, tmp_directory: str) -> dict:
+    with tempfile.TemporaryDirectory() as result_directory:
+        result_file = os.path.join(result_directory, "result.json")
+        cmd = [sys.executable, os.path.abspath(__file__),
+               "--run-one", config_name,
+               "--chunk-durations", str(chunk_duration),
+               "--clips", clips_directory,
+               "--tmp-dir", tmp_directory,
+               "--result-file", result_file]
+        process = subprocess.run(cmd, capture_output=True, text=True)
+        if process.returncode != 0 or not os.path.exists(result_file):
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"
+            logger.error(f"Benchmark {config_name}: {error}")
+            return {"config": config_name, "chunk_duration": chunk_duration, "error": error}
+        with open(result_file, encoding="utf-8") as file:
+            return json.load(file)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.run_one:
+        result = run_config(args.run_one, args.chunk_durations[0], args.clips, args.tmp_dir)
+        with open(args.result_file, "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        return 0
+
+    with tempfile.TemporaryDirectory() as synthesized_directory:
+        if args.clips:
+            clips_directory, source = args.clips, os.path.abspath(args.clips)
+        else:
+            clips_directory, source = synthesized_directory, prepare_clips(synthesized_directory)
+        clips = load_clips(clips_directory)
+        if not clips:
+            logger.error(f"No wav files in {clips_directory}")
+            return 2
+
+        results = []
+        for config_name in args.configs:
+            for chunk_duration in args.chunk_durations:
+                logger.log(f"Benchmark: {config_name}, chunk {chunk_duration} sec")
+                results.append(run_in_child(config_name, chunk_duration, clips_directory, args.tmp_dir))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "clips": {
+            "source": source,
+            "count": len(clips),
+            "audio_seconds": round(sum(audio.shape[0] for _, audio, _ in clips) / sampleRate, 3),
+            "with_reference": sum(1 for _, _, reference in clips if reference is not None),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    logger.log(f"Benchmark report saved to {args.output}")
+    return 0 if all("error" not in result for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
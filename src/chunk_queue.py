@@ -0,0 +1,130 @@
+from collections import deque
+from queue import Empty
+from threading import Lock, Condition
+from time import monotonic
+from typing import Callable, Optional
+
+import numpy as np
+
+from constants import overflowBlock, overflowMerge, overflowDropOldest
+from logger import logger
+from model import ChunkAudio
+
+
+class ChunkQueue:
+    """
+    Bounded queue of ChunkAudio between capture and transcription. Has the same interface as queue.Queue.
+    When the queue is full put() applies the overflow policy:
+      - block: wait until the transcriber takes a chunk
+      - merge: append the audio to the newest queued chunk, so fewer but longer chunks are decoded
+      - drop oldest: discard the oldest queued chunk
+    """
+
+    def __init__(self, maxsize: int, overflow_policy: str, name: str, max_merged_duration: float = 30.0):
+        if overflow_policy not in (overflowBlock, overflowMerge, overflowDropOldest):
+            raise ValueError(f"unknown queue overflow policy {overflow_policy}")
+        self.maxsize = maxsize
+        self.overflow_policy = overflow_policy
+        self.name = name
+        self.max_merged_duration = max_merged_duration
+        self.dropped_count = 0
+        self.merged_count = 0
+        self._items = deque()
+        self._mutex = Lock()
+        self._not_empty = Condition(self._mutex)
+        self._not_full = Condition(self._mutex)
+        self._all_tasks_done = Condition(self._mutex)
+        self._unfinished_tasks = 0
+
+    def put(self, chunk_audio: ChunkAudio):
+        with self._not_full:
+            if len(self._items) >= self.maxsize:
+                if self.overflow_policy == overflowBlock:
+                    while len(self._items) >= self.maxsize:
+                        self._not_full.wait()
+                elif self.overflow_policy == overflowMerge and self._merge_into_newest(chunk_audio):
+                    return
+                else:
+                    self._drop_oldest()
+            self._items.append(chunk_audio)
+            self._unfinished_tasks += 1
+            self._not_empty.notify()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None,
+            on_taken: Optional[Callable[[ChunkAudio], None]] = None) -> ChunkAudio:
+        """on_taken is called with the chunk before the queue is unlocked, so the caller can mark it taken atomically"""
+        with self._not_empty:
+            if not block:
+                if not self._items:
+                    raise Empty
+            elif timeout is None:
+                while not self._items:
+                    self._not_empty.wait()
+            else:
+                end_time = monotonic() + timeout
+                while not self._items:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0.0:
+                        raise Empty
+                    self._not_empty.wait(remaining)
+            chunk_audio = self._items.popleft()
+            if on_taken is not None:
+                on_taken(chunk_audio)
+            self._not_full.notify()
+            return chunk_audio
+
+    def get_nowait(self, on_taken: Optional[Callable[[ChunkAudio], None]] = None) -> ChunkAudio:
+        return self.get(block=False, on_taken=on_taken)
+
+    def task_done(self):
+        with self._all_tasks_done:
+            self._task_done_locked()
+
+    def join(self):
+        with self._all_tasks_done:
+            while self._unfinished_tasks:
+                self._all_tasks_done.wait()
+
+    def qsize(self) -> int:
+        with self._mutex:
+            return len(self._items)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def oldest_captured_at(self) -> Optional[float]:
+        with self._mutex:
+            return self._items[0].captured_at if self._items else None
+
+    def oldest_capture_start(self) -> Optional[float]:
+        with self._mutex:
+            return self._items[0].capture_start if self._items else None
+
+    def _task_done_locked(self):
+        if self._unfinished_tasks <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished_tasks -= 1
+        if self._unfinished_tasks == 0:
+            self._all_tasks_done.notify_all()
+
+    def _merge_into_newest(self, chunk_audio: ChunkAudio) -> bool:
+        newest = self._items[-1]
+        if newest.duration + chunk_audio.duration > self.max_merged_duration:
+            return False
+        self._items[-1] = ChunkAudio(
+            index=newest.index,
+            data=np.concatenate((newest.data, chunk_audio.data)),
+            sample_rate=newest.sample_rate,
+            captured_at=chunk_audio.captured_at,
+            capture_start=newest.capture_start
+        )
+        self._items[-1].queued_at = newest.queued_at
+        self.merged_count += 1
+        logger.log(f"ChunkQueue {self.name}: queue is full, merged chunk {chunk_audio.index} into chunk {newest.index}")
+        return True
+
+    def _drop_oldest(self):
+        dropped = self._items.popleft()
+        self._task_done_locked()
+        self.dropped_count += 1
+        logger.error(f"ChunkQueue {self.name}: queue is full, dropped chunk {dropped.index}. Dropped in total: {self.dropped_count}")
@@ -0,0 +1,137 @@
+"""
+Headless file transcription, runs without the GUI and without tkinter.
+
+    python src/cli.py meeting.mp3 recordings/ --model base.en --workers 4 --format srt
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+from ai_model import AiModel
+from configs import OutputConfig, TranscriberConfig
+from constants import *
+from job_queue import JobQueue, collect_audio_files
+from logger import logger, logLevelDebug
+from pipeline_metrics import metrics, MetricsServer
+from output_stream import OutputStreamServer
+
+
+def build_parser() -> argparse.ArgumentParser:
+    output_directory, tmp_directory = get_default_directories()
+    parser = argparse.ArgumentParser(description="Transcribe audio files with a local Whisper model")
+    parser.add_argument("paths", nargs="+", help="audio files or directories with audio files")
+    parser.add_argument("--model", default="base", help="Whisper model name (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes per file, each loads its own copy of the model (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="files transcribed at the same time, needs --workers above 1,"
+                             " otherwise files share 1 model and run one by one (default: %(default)s)")
+    parser.add_argument("--format", dest="output_format", default=outputFormatTxt,
+                        choices=[outputFormatTxt, outputFormatSrt, outputFormatJson],
+                        help="output file format (default: %(default)s)")
+    parser.add_argument("--output-dir", default=output_directory, help="default: %(default)s")
+    parser.add_argument("--tmp-dir", default=tmp_directory,
+                        help="downloaded models, checkpoints and cache (default: %(default)s)")
+    parser.add_argument("--verbose", action="store_true", help="log every chunk and segment")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:<port>/metrics while transcribing")
+    parser.add_argument("--metrics-file", help="save the pipeline metrics into this JSON file at the end")
+    parser.add_argument("--stream-port", type=int,
+                        help="push transcribed lines as JSON lines to subscribers of 127.0.0.1:<port>")
+    return parser
+
+
+def parse_args(parser: argparse.ArgumentParser, argv=None) -> argparse.Namespace:
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return args
+
+
+def get_default_directories():
+    """The same output and tmp directories as the GUI uses"""
+    base_directory = os.path.dirname(os.path.abspath(__file__))
+    head, tail = os.path.split(base_directory)
+    if tail == "src":
+        return os.path.join(head, "output"), os.path.join(head, "tmp")
+    return base_directory, os.path.join(base_directory, "tmp")
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parse_args(parser, argv)
+    if args.verbose:
+        logger.set_level(logLevelDebug)
+    logger.set_log_file(os.path.join(args.tmp_dir, "logs", "cli.log"))
+    files = collect_audio_files(args.paths)
+    if not files:
+        logger.error("No audio files to transcribe")
+        return 2
+
+    # the ports are checked before the model is loaded, a port in use is a usage error
+    output_stream = None
+    if args.stream_port:
+        output_stream = OutputStreamServer(args.stream_port)
+        try:
+            output_stream.start()
+        except OSError as e:
+            parser.error(f"can't stream lines on port {args.stream_port}: {e.strerror or e}")
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = MetricsServer(metrics, args.metrics_port)
+        try:
+            metrics_server.start()
+        except OSError as e:
+            parser.error(f"can't serve metrics on port {args.metrics_port}: {e.strerror or e}")
+
+    # with several workers each worker process loads the model, the main process doesn't need it
+    ai_model = None
+    if args.workers == 1:
+        ai_model = AiModel(args.model, args.tmp_dir)
+        ai_model.load()
+
+    transcriber_config = TranscriberConfig(
+        recogniser_name=recogniserDummy,
+        tmp_directory=args.tmp_dir,
+        use_ai=True,
+        model_name=args.model,
+        transcription_index=0,
+        speaker_name="",
+        file_workers=args.workers
+    )
+    output_config = OutputConfig(args.output_dir, args.output_format)
+    job_queue = JobQueue(output_config, transcriber_config, ai_model, args.jobs,
+                         output_sink=output_stream.publish if output_stream is not None else None)
+    for file_path in files:
+        job_queue.add(file_path)
+    job_queue.start()
+    try:
+        job_queue.wait()
+    except KeyboardInterrupt:
+        job_queue.stop()
+        job_queue.wait()
+        logger.log("Interrupted, run the same command again to resume")
+        return 130
+    finally:
+        if args.metrics_file:
+            metrics.export_json(args.metrics_file)
+        if metrics_server is not None:
+            metrics_server.stop()
+        if output_stream is not None:
+            output_stream.stop()
+
+    failed = [job.file_path for job in job_queue.get_jobs() if job.status == jobStatusFailed]
+    if failed:
+        logger.error(f"{len(failed)} of {len(files)} files failed: {', '.join(failed)}")
+        return 1
+    logger.log(f"{len(files)} files transcribed into {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    # file transcription workers are separate processes, required for the PyInstaller build
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,12 +1,18 @@
 from dataclasses import dataclass
 from typing import Optional
 
+from constants import overflowMerge, outputFormatTxt
 from model import AudioInputLine
 
 
 @dataclass
 class OutputConfig:
     output_directory: str
+    output_format: str = outputFormatTxt
+    file_name: Optional[str] = None  # without extension, transcription-<n> is used when not set
+    flush_interval: float = 1.0  # seconds, lines reach the disk at least this often
+    flush_size: int = 64 * 1024  # characters, buffered lines are flushed earlier when they reach this size
+    max_reorder_delay: float = 10.0  # seconds, max time a line waits for earlier speech of other speakers
 
 
 @dataclass
@@ -17,10 +23,19 @@ class TranscriberConfig:
     model_name: Optional[str]
     transcription_index: int
     speaker_name: str
+    streaming: bool = False
+    streaming_step: float = 0.5
+    streaming_window: float = 10.0
+    queue_size: int = 10
+    overflow_policy: str = overflowMerge
+    file_workers: int = 1
+    cache_size_mb: int = 100
 
 
 @dataclass
 class AudioListenerConfig:
     input_line: AudioInputLine
     chunk_duration: int
-    transcription_index: int
\ No newline at end of file
+    transcription_index: int
+    use_vad: bool
+    streaming: bool = False
\ No newline at end of file
@@ -7,4 +7,38 @@ recogniserSphinx = "sphinx"
 recogniserGoogleCloud = "google cloud"
 
 deviceTypeInput = "input"
-deviceTypeOutput = "output"
\ No newline at end of file
+deviceTypeOutput = "output"
+
+overflowBlock = "block"
+overflowMerge = "merge"
+overflowDropOldest = "drop oldest"
+
+# RAM for AI models which stay loaded between sessions
+modelMemoryBudgetMb = 4096
+# processes which transcribe segments of 1 file
+fileWorkersDefault = 1
+
+# milliseconds between batches of log records drained into the GUI
+logDrainInterval = 100
+# lines kept in the log panel, the full log is in tmp/logs
+logViewMaxLines = 5000
+logFileMaxBytes = 10 * 1024 * 1024
+logFileBackupCount = 5
+
+# localhost port of the Prometheus metrics endpoint
+metricsServerPort = 9464
+# localhost port of the JSON lines stream of transcribed text
+outputStreamPort = 9465
+outputStreamMaxBuffered = 1000  # records waiting for 1 subscriber, the oldest are dropped when a subscriber is too slow
+
+outputFormatTxt = "txt"
+outputFormatSrt = "srt"
+outputFormatJson = "json"
+
+audioFileExtensions = (".mp3", ".wav", ".m4a", ".aac", ".ogg")
+
+jobStatusQueued = "queued"
+jobStatusRunning = "running"
+jobStatusDone = "done"
+jobStatusFailed = "failed"
+jobStatusCancelled = "cancelled"
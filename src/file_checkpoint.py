@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+from typing import List
+
+from logger import logger
+
+
+def file_content_hash(file_path: str) -> str:
+    """sha256 of the file content, so a renamed or copied recording is still recognised"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def transcription_key(content_hash: str, model_name: str, options: dict) -> str:
+    """Identifies a transcription result: same audio, same model and same decode options give the same text"""
+    key = json.dumps({"audio": content_hash, "model": model_name, "options": options}, sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class FileCheckpoint:
+    """
+    Finished segments of a file transcription, persisted as JSON lines in <tmp_directory>/checkpoints.
+    Each segment is appended and synced to disk as soon as it is transcribed,
+    so an interrupted job can be resumed from the last completed segment
+    """
+
+    def __init__(self, tmp_directory: str, key: str):
+        self._directory = os.path.join(tmp_directory, "checkpoints")
+        self.file_path = os.path.join(self._directory, f"{key}.jsonl")
+
+    def load(self) -> List[dict]:
+        """Completed segment results in order"""
+        if not os.path.exists(self.file_path):
+            return []
+        results = []
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # the app was closed in the middle of writing the last line
+                    break
+                if result["index"] != len(results):
+                    break
+                results.append(result)
+        return results
+
+    def append(self, result: dict):
+        os.makedirs(self._directory, exist_ok=True)
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        try:
+            if os.path.exists(self.file_path):
+                os.remove(self.file_path)
+        except Exception as e:
+            logger.error(f"FileCheckpoint: can't remove {self.file_path}: {e}")
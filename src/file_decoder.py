@@ -0,0 +1,77 @@
+import subprocess
+from collections import deque
+from threading import Thread
+from typing import Iterator
+
+import numpy as np
+
+from logger import logger
+
+# last stderr lines of ffmpeg which are kept for the error message
+decoderErrorLines = 20
+
+
+class FileAudioDecoder:
+    """
+    Decodes an audio file with ffmpeg through a pipe, in fixed-size windows of 16 kHz mono float32 samples.
+    Memory stays flat no matter how long the file is, and the first window is ready right after ffmpeg starts
+    """
+
+    def __init__(self, file_path: str, window_duration: float = 30.0, sample_rate: int = 16000, start: float = 0.0):
+        self.file_path = file_path
+        self._start = start
+        self._sample_rate = sample_rate
+        self._window_bytes = int(window_duration * sample_rate) * 2  # 16 bit samples
+        self._process = None
+        self._stderr_thread = None
+        self._stderr_lines = deque(maxlen=decoderErrorLines)
+
+    def windows(self) -> Iterator[np.ndarray]:
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-loglevel", "error",
+            "-threads", "0",
+            "-ss", f"{self._start:.3f}",
+            "-i", self.file_path,
+            "-f", "s16le",
+            "-ac", "1",
+            "-acodec", "pcm_s16le",
+            "-ar", str(self._sample_rate),
+            "-"
+        ]
+        self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # stderr is drained all the time, ffmpeg would block on a full stderr pipe and never close stdout
+        self._stderr_lines.clear()
+        self._stderr_thread = Thread(target=self._drain_stderr, args=(self._process.stderr,), daemon=True)
+        self._stderr_thread.start()
+        try:
+            while True:
+                data = self._process.stdout.read(self._window_bytes)
+                if not data:
+                    break
+                yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+            return_code = self._process.wait()
+            self._stderr_thread.join()
+            if return_code != 0:
+                stderr = "".join(self._stderr_lines)
+                raise RuntimeError(f"Failed to decode audio {self.file_path}, ffmpeg exit code {return_code}: {stderr}")
+        finally:
+            self.close()
+
+    def _drain_stderr(self, stderr):
+        for line in stderr:
+            self._stderr_lines.append(line.decode(errors="ignore"))
+
+    def close(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                logger.log(f"FileAudioDecoder: stop decoding {self.file_path}")
+                self._process.kill()
+                self._process.wait()
+            self._process.stdout.close()
+            if self._stderr_thread is not None:
+                self._stderr_thread.join()  # ends at EOF of stderr, after the process exits
+                self._stderr_thread = None
+            self._process.stderr.close()
+            self._process = None
@@ -12,6 +12,7 @@ class FileListener(ListenerBase):
         self.is_running = False
         self.input_file = None
         self._processing_thread = None
+        self.error = None  # message of the exception which stopped the transcription
 
     def set_input_file(self, file_path):
         """Set the input file path to process"""
@@ -30,14 +31,20 @@ class FileListener(ListenerBase):
         logger.log("FileListener stopping")
 
         if self._processing_thread is not None and self._processing_thread.is_alive():
-            try:
-                self._processing_thread._stop()
-                logger.log("FileListener interrupted current file processing")
-            except Exception as e:
-                logger.error(f"FileListener can't interrupted current file processing: {e}."
-                             f" You need to manually close the app or wait until transcription is finished")
+            self.transcriber.cancel_file()
+            logger.log("FileListener will stop after the current segment, finished segments are saved for resuming")
         logger.log("FileListener stop")
 
+    def wait(self):
+        """Block until the file is transcribed and the output is closed"""
+        if self._processing_thread is not None:
+            self._processing_thread.join()
+
     def _process_file(self):
-        self.transcriber.transcribe_file(self.input_file)
-        self.transcriber.stop()
\ No newline at end of file
+        try:
+            self.transcriber.transcribe_file(self.input_file)
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"FileListener: transcription of {self.input_file} failed: {e}")
+        finally:
+            self.transcriber.stop()
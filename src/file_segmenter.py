@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+
+@dataclass
+class AudioSegment:
+    index: int
+    start: float  # seconds from the beginning of the file
+    data: np.ndarray
+
+    @property
+    def end(self) -> float:
+        return self.start + self.data.shape[0] / 16000
+
+
+class SilenceSplitter:
+    """
+    Cuts long 16 kHz audio into segments of about target_duration seconds.
+    Each cut is placed at the quietest frame within search_duration around the target boundary,
+    so words are not split between segments.
+    start_time and first_index are used to continue an interrupted file from the middle
+    """
+
+    def __init__(self, sample_rate: int = 16000, target_duration: float = 60.0,
+                 search_duration: float = 10.0, frame_duration: float = 0.05,
+                 start_time: float = 0.0, first_index: int = 0):
+        self._sample_rate = sample_rate
+        self._target_duration = target_duration
+        self._search_duration = search_duration
+        self._frame_duration = frame_duration
+        self._target_samples = int(sample_rate * target_duration)
+        self._search_samples = int(sample_rate * search_duration)
+        self._frame_length = int(sample_rate * frame_duration)
+        self._pending: List[np.ndarray] = []
+        self._pending_samples = 0
+        self._position = int(start_time * sample_rate)  # samples from the beginning of the file already emitted
+        self._index = first_index
+
+    def options(self) -> dict:
+        """Parameters which decide where the cuts are, a transcript of the same audio depends on them"""
+        return {
+            "sample_rate": self._sample_rate,
+            "target_duration": self._target_duration,
+            "search_duration": self._search_duration,
+            "frame_duration": self._frame_duration,
+        }
+
+    def feed(self, samples: np.ndarray) -> List[AudioSegment]:
+        """Add decoded audio. Returns segments which are complete now"""
+        self._pending.append(samples)
+        self._pending_samples += samples.shape[0]
+        if self._pending_samples < self._target_samples + self._search_samples // 2:
+            return []
+
+        audio = np.concatenate(self._pending)
+        segments = []
+        offset = 0
+        while audio.shape[0] - offset >= self._target_samples + self._search_samples // 2:
+            split = offset + self._find_split(audio[offset:])
+            segments.append(self._emit(audio[offset:split]))
+            offset = split
+        self._pending = [audio[offset:]]
+        self._pending_samples = audio.shape[0] - offset
+        return segments
+
+    def flush(self) -> Optional[AudioSegment]:
+        """Returns the rest of the audio when the input ends"""
+        if self._pending_samples == 0:
+            return None
+        segment = self._emit(np.concatenate(self._pending))
+        self._pending = []
+        self._pending_samples = 0
+        return segment
+
+    def _find_split(self, audio: np.ndarray) -> int:
+        search_start = self._target_samples - self._search_samples // 2
+        window = audio[search_start:search_start + self._search_samples]
+        frames_count = window.shape[0] // self._frame_length
+        if frames_count == 0:
+            return self._target_samples
+        frames = window[:frames_count * self._frame_length].reshape(frames_count, self._frame_length)
+        energy = np.einsum("ij,ij->i", frames, frames)
+        quietest = int(np.argmin(energy))
+        return search_start + quietest * self._frame_length + self._frame_length // 2
+
+    def _emit(self, data: np.ndarray) -> AudioSegment:
+        segment = AudioSegment(self._index, self._position / self._sample_rate, np.ascontiguousarray(data))
+        self._index += 1
+        self._position += data.shape[0]
+        return segment
@@ -5,9 +5,11 @@ from tkinter import ttk, filedialog, messagebox
 from audio_devices import get_devices_names
 from model import InputMode, AudioInputLine
 from actions import TranscriberActions
-from constants import recogniserDummy, recogniserSphinx, recogniserGoogleCloud
+from constants import recogniserDummy, recogniserSphinx, recogniserGoogleCloud, overflowBlock, overflowMerge, overflowDropOldest, metricsServerPort, outputStreamPort, logViewMaxLines, modelMemoryBudgetMb, fileWorkersDefault
+from job_queue import collect_audio_files
+from logger import logger, logLevelDebug, logLevelInfo
+from log_view import LogView
 from gui_utils import get_available_models, get_downloaded_models, format_model_name
-import whisper
 import threading
 
 
@@ -46,30 +48,41 @@ class LiveListenProps:
 
 class FileListenProps:
     def __init__(self):
-        self.selected_file =  tk.StringVar()
+        self.selected_file =  tk.StringVar()  # shows the selected file or the number of selected files
+        self.selected_files = []
+        self.workers = tk.StringVar(value=str(fileWorkersDefault))
+        self.concurrent_jobs = tk.StringVar(value="1")
 
 class OutputProps:
     def __init__(self, output_directory: str, tmp_directory: str):
         self.output_directory = tk.StringVar(value=output_directory)
         self.tmp_directory = tk.StringVar(value=tmp_directory)
+        self.stream_output = tk.BooleanVar(value=False)
 
 class RecognizerProps:
     def __init__(self, default_recognizer: str):
         self.selected_recognizer = tk.StringVar(value=default_recognizer)
         self.chunk_duration = tk.StringVar(value="5")
+        self.use_vad = tk.BooleanVar(value=True)
+        self.streaming = tk.BooleanVar(value=False)
+        self.overflow_policy = tk.StringVar(value=overflowMerge)
         self.use_ai = tk.BooleanVar(value=False)
         self.selected_ai_model = tk.StringVar()
         self.ai_model_dropdown = None
+        self.model_memory_mb = tk.StringVar(value=str(modelMemoryBudgetMb))
 
 class StatusProps:
     def __init__(self, default_status: str):
         self.status = tk.StringVar(value=default_status)
+        self.stats = tk.StringVar()  # pipeline metrics, 1 line per speaker
+        self.serve_metrics = tk.BooleanVar(value=False)
         self.start_button = None
         self.transcribing = False
 
 class LogsProps:
     def __init__(self):
-        self.logs_text = None
+        self.log_view = None
+        self.debug = tk.BooleanVar(value=False)  # per chunk log lines
 
 class GuiRenderer:
 
@@ -201,6 +214,33 @@ class GuiRenderer:
             input_line.speaker_name = speaker_var.get()
         speaker_var.trace_add("write", on_speaker_change)
 
+        # Channel entry, empty - the default stream of the device. Lines with channels of the same device share 1 stream
+        channel_label = ttk.Label(line_frame, text="Channel:")
+        channel_label.pack(side="left", padx=(5, 2))
+
+        channel_var = tk.StringVar(value=str(input_line.channel + 1) if input_line.channel is not None else "")
+
+        # only an empty entry or a channel number from 1 can be typed, the range is checked by the listener at Start
+        def validate_channel(value):
+            if value == "" or (value.isdigit() and int(value) > 0):
+                return True
+            logger.show_error(f"Channel must be a number from 1, or empty for the default stream of the device."
+                              f" '{value}' is not a channel")
+            return False
+        channel_entry = ttk.Entry(
+            line_frame,
+            textvariable=channel_var,
+            width=3,
+            validate="key",
+            validatecommand=(line_frame.register(validate_channel), "%P")
+        )
+        channel_entry.pack(side="left", padx=(0, 5))
+
+        def on_channel_change(*args):
+            value = channel_var.get()
+            input_line.channel = int(value) - 1 if value else None
+        channel_var.trace_add("write", on_channel_change)
+
         # Record checkbox
         record_var = tk.BooleanVar(value=input_line.record)
         record_check = ttk.Checkbutton(
@@ -271,24 +311,63 @@ class GuiRenderer:
         )
         file_entry.pack(side="left", fill="x", expand=True)
 
+        choose_folder_btn = ttk.Button(
+            self.file_frame,
+            text="Choose Folder",
+            command=self._choose_input_folder
+        )
+        choose_folder_btn.pack(side="right", padx=(5, 0))
+
         choose_file_btn = ttk.Button(
             self.file_frame,
-            text="Choose File",
+            text="Choose Files",
             command=self._choose_input_file
         )
         choose_file_btn.pack(side="right", padx=(5, 0))
+
+        # Number of files which are transcribed at the same time
+        jobs_entry = ttk.Entry(
+            self.file_frame,
+            textvariable=self.file_listen_props.concurrent_jobs,
+            width=4
+        )
+        jobs_entry.pack(side="right", padx=(5, 0))
+        jobs_label = ttk.Label(self.file_frame, text="Files at once:")
+        jobs_label.pack(side="right", padx=(5, 0))
+
+        # Number of processes which transcribe parts of the file in parallel
+        workers_entry = ttk.Entry(
+            self.file_frame,
+            textvariable=self.file_listen_props.workers,
+            width=4
+        )
+        workers_entry.pack(side="right", padx=(5, 0))
+        workers_label = ttk.Label(self.file_frame, text="Workers:")
+        workers_label.pack(side="right", padx=(5, 0))
         self._update_input_mode()
 
     def _choose_input_file(self):
-        file_path = filedialog.askopenfilename(
-            title="Select Audio File",
+        file_paths = filedialog.askopenfilenames(
+            title="Select Audio Files",
             filetypes=[
                 ("Audio Files", "*.mp3 *.wav *.m4a *.aac *.ogg"),
                 ("All Files", "*.*")
             ]
         )
-        if file_path:
-            self.file_listen_props.selected_file.set(file_path)
+        if file_paths:
+            self._set_input_files(list(file_paths))
+
+    def _choose_input_folder(self):
+        directory = filedialog.askdirectory(title="Select Folder with Audio Files")
+        if directory:  # If user didn't cancel
+            self._set_input_files(collect_audio_files([directory]))
+
+    def _set_input_files(self, file_paths):
+        self.file_listen_props.selected_files = file_paths
+        if len(file_paths) == 1:
+            self.file_listen_props.selected_file.set(file_paths[0])
+        else:
+            self.file_listen_props.selected_file.set(f"{len(file_paths)} files")
 
     def _render_input_frame(self):
         if self.input_frame is None:
@@ -346,6 +425,14 @@ class GuiRenderer:
         )
         tmp_directory_choose_btn.pack(side="right", padx=(5, 0))
 
+        stream_output_checkbox = ttk.Checkbutton(
+            output_frame,
+            text=f"Stream lines as JSON to localhost:{outputStreamPort}",
+            variable=self.output_props.stream_output,
+            command=self.actions.toggle_output_stream
+        )
+        stream_output_checkbox.pack(anchor="w", pady=(5, 0))
+
     def render_recognizer_section(self):
         recogniser_frame = ttk.LabelFrame(self.root, text="Speech recognition", padding="10")
         recogniser_frame.pack(fill="x", padx=10, pady=5)
@@ -384,6 +471,36 @@ class GuiRenderer:
         )
         duration_entry.pack(side="left")
 
+        vad_checkbox = ttk.Checkbutton(
+            duration_frame,
+            text="Split on pauses",
+            variable=self.recognizer_props.use_vad
+        )
+        vad_checkbox.pack(side="left", padx=(10, 0))
+
+        streaming_checkbox = ttk.Checkbutton(
+            duration_frame,
+            text="Streaming",
+            variable=self.recognizer_props.streaming
+        )
+        streaming_checkbox.pack(side="left", padx=(10, 0))
+
+        # What to do when transcription can't keep up with the speakers
+        overflow_frame = ttk.Frame(recogniser_frame)
+        overflow_frame.pack(fill="x", pady=(5, 0))
+
+        overflow_label = ttk.Label(overflow_frame, text="When transcription is behind:")
+        overflow_label.pack(side="left", padx=(0, 5))
+
+        overflow_dropdown = ttk.Combobox(
+            overflow_frame,
+            textvariable=self.recognizer_props.overflow_policy,
+            state="readonly",
+            width=15
+        )
+        overflow_dropdown['values'] = [overflowMerge, overflowBlock, overflowDropOldest]
+        overflow_dropdown.pack(side="left")
+
         # AI Section
         ai_frame = ttk.LabelFrame(recogniser_frame, text="AI", padding="10")
         ai_frame.pack(fill="x", pady=(10, 5), expand=True)
@@ -396,6 +513,16 @@ class GuiRenderer:
         )
         ai_toggle.pack(side="left")
 
+        # RAM for the models kept loaded between sessions, the least recently used ones are unloaded above it
+        memory_entry = ttk.Entry(
+            ai_frame,
+            textvariable=self.recognizer_props.model_memory_mb,
+            width=6
+        )
+        memory_entry.pack(side="right", padx=(5, 0))
+        memory_label = ttk.Label(ai_frame, text="Models RAM (MB):")
+        memory_label.pack(side="right", padx=(5, 0))
+
         # AI model dropdown
         self.recognizer_props.ai_model_dropdown = ttk.Combobox(
             ai_frame,
@@ -414,6 +541,31 @@ class GuiRenderer:
         )
         status_text.pack(fill="x")
 
+        stats_text = ttk.Label(
+            status_frame,
+            textvariable=self.status_props.stats,
+            justify="left"
+        )
+        stats_text.pack(fill="x")
+
+        stats_frame = ttk.Frame(status_frame)
+        stats_frame.pack(fill="x", pady=(5, 0))
+
+        export_stats_btn = ttk.Button(
+            stats_frame,
+            text="Export stats",
+            command=self._export_stats
+        )
+        export_stats_btn.pack(side="left")
+
+        serve_metrics_checkbox = ttk.Checkbutton(
+            stats_frame,
+            text=f"Serve metrics on localhost:{metricsServerPort}",
+            variable=self.status_props.serve_metrics,
+            command=self.actions.toggle_metrics_server
+        )
+        serve_metrics_checkbox.pack(side="left", padx=(10, 0))
+
         self.status_props.start_button = ttk.Button(
             self.root,
             text="Start",
@@ -425,29 +577,19 @@ class GuiRenderer:
         logs_frame = ttk.LabelFrame(self.root, text="Logs", padding="10")
         logs_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
-        # Create a frame to hold both the text widget and scrollbar
-        text_frame = ttk.Frame(logs_frame)
-        text_frame.pack(fill="both", expand=True)
-
-        # Create the text widget
-        self.logs_props.logs_text = tk.Text(
-            text_frame,
-            height=10,
-            wrap=tk.WORD,
-            state="disabled"
+        debug_checkbox = ttk.Checkbutton(
+            logs_frame,
+            text="Debug logs (every chunk)",
+            variable=self.logs_props.debug,
+            command=self._toggle_debug_logs
         )
-        self.logs_props.logs_text.pack(side="left", fill="both", expand=True)
+        debug_checkbox.pack(anchor="w", pady=(0, 5))
 
-        # Create the scrollbar
-        scrollbar = ttk.Scrollbar(
-            text_frame,
-            orient="vertical",
-            command=self.logs_props.logs_text.yview
-        )
-        scrollbar.pack(side="right", fill="y")
+        self.logs_props.log_view = LogView(logs_frame, logViewMaxLines)
+        self.logs_props.log_view.pack(fill="both", expand=True)
 
-        # Configure the text widget to use the scrollbar
-        self.logs_props.logs_text.configure(yscrollcommand=scrollbar.set)
+    def _toggle_debug_logs(self):
+        logger.set_level(logLevelDebug if self.logs_props.debug.get() else logLevelInfo)
 
     def render_all(self):
         self.render_main()
@@ -458,6 +600,16 @@ class GuiRenderer:
         self.render_status_section()
         self.render_logs_section()
 
+    def _export_stats(self):
+        file_path = filedialog.asksaveasfilename(
+            initialdir=self.output_props.output_directory.get(),
+            title="Export Stats",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")]
+        )
+        if file_path:  # If user didn't cancel
+            self.actions.export_stats(file_path)
+
     def _choose_directory(self):
         directory = filedialog.askdirectory(
             initialdir=self.output_props.output_directory.get(),
@@ -485,6 +637,7 @@ class GuiRenderer:
         if self.recognizer_props.use_ai.get():
             self.recognizer_props.ai_model_dropdown.config(state="readonly")
             self._update_ai_models_dropdown()
+            self.actions.preload_model()
         else:
             self.recognizer_props.ai_model_dropdown.config(state="disabled")
             self.recognizer_props.selected_ai_model.set("")
@@ -521,6 +674,8 @@ class GuiRenderer:
         if "to download" in selection:
             if messagebox.askyesno("Download Model", f"Model '{model_name}' is not downloaded. Do you want to download it?"):
                 self._download_model(model_name)
+        else:
+            self.actions.preload_model()
 
     def _download_model(self, model_name):
         self.status_props.status.set(f"Downloading {model_name} model...")
@@ -530,10 +685,12 @@ class GuiRenderer:
 
         def do_download():
             try:
+                import whisper
                 whisper.load_model(model_name, download_root=self.output_props.tmp_directory.get())
                 self.status_props.status.set(f"Model {model_name} downloaded.")
                 # self._update_ai_models_dropdown() must be called from main thread
                 self.root.after(0, self._update_ai_models_dropdown)
+                self.root.after(0, self.actions.preload_model)
 
             except Exception as e:
                 self.status_props.status.set(f"Error downloading {model_name}: {e}")
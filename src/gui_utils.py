@@ -1,8 +1,9 @@
 import os
-import whisper
 
 def get_available_models():
     """Returns a list of available whisper models."""
+    # whisper imports torch, which takes seconds, so it's imported only when AI is enabled
+    import whisper
     return whisper.available_models()
 
 def get_downloaded_models(tmp_directory):
@@ -0,0 +1,124 @@
+from threading import Thread, Event, Lock
+from typing import List, Optional, Tuple
+
+from ai_model import AiModel, result_confidence
+from logger import logger
+from model import ChunkAudio
+
+# the language of a speaker is pinned once it is detected with at least this probability,
+# e.g. a first chunk of noise is decoded with per clip detection and the language is detected again from the next one
+languageMinProbability = 0.5
+
+
+class InferenceScheduler:
+    """
+    Owns the AI model for a live session.
+    Collects pending chunks from every registered Transcriber and decodes them as one padded batch,
+    so speakers don't call the model concurrently and each forward pass serves several chunks.
+    """
+
+    def __init__(self, ai_model: AiModel, max_batch_size: int = 8):
+        self._ai_model = ai_model
+        self._max_batch_size = max_batch_size
+        self._transcribers = []
+        self._transcribers_lock = Lock()
+        self._wakeup = Event()
+        self._should_stop = False
+        self._thread: Optional[Thread] = None
+
+    def start(self):
+        self._should_stop = False
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.log("InferenceScheduler start")
+
+    def register(self, transcriber):
+        with self._transcribers_lock:
+            self._transcribers.append(transcriber)
+
+    def unregister(self, transcriber):
+        with self._transcribers_lock:
+            if transcriber in self._transcribers:
+                self._transcribers.remove(transcriber)
+
+    def notify(self):
+        """Wake up the scheduler, a new chunk was queued"""
+        self._wakeup.set()
+
+    def stop(self):
+        logger.log("InferenceScheduler stop")
+        self._should_stop = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._should_stop:
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+            while self._process_batch():
+                pass
+
+    def _collect_batch(self) -> List[Tuple[object, ChunkAudio]]:
+        """Take chunks round-robin, so one talkative speaker can't starve the others"""
+        with self._transcribers_lock:
+            transcribers = list(self._transcribers)
+
+        batch = []
+        while len(batch) < self._max_batch_size:
+            taken = False
+            for transcriber in transcribers:
+                if len(batch) >= self._max_batch_size:
+                    break
+                chunk_audio = transcriber.next_pending_chunk()
+                if chunk_audio is not None:
+                    batch.append((transcriber, chunk_audio))
+                    taken = True
+            if not taken:
+                break
+        return batch
+
+    def _detect_languages(self, batch: List[Tuple[object, ChunkAudio]], audios):
+        """The language of a speaker is detected once, from its first chunk with clear speech"""
+        for (transcriber, _), audio in zip(batch, audios):
+            if transcriber.language is not None:
+                continue
+            language, probability = self._ai_model.detect_language(audio)
+            if probability >= languageMinProbability:
+                transcriber.language = language
+                logger.log(f"InferenceScheduler: {transcriber.speaker_name} speaks language '{language}'")
+
+    def _process_batch(self) -> bool:
+        batch = self._collect_batch()
+        if not batch:
+            return False
+
+        audios = [transcriber.to_ai_audio(chunk_audio) for transcriber, chunk_audio in batch]
+        texts = [""] * len(batch)
+        confidences = [None] * len(batch)
+        batched = [i for i, audio in enumerate(audios) if self._ai_model.can_transcribe_in_batch(audio)]
+        try:
+            self._detect_languages(batch, audios)
+            # 1 batch decode per language, the language of a batch is pinned instead of detected per clip
+            by_language = {}
+            for i in batched:
+                by_language.setdefault(batch[i][0].language, []).append(i)
+            for language, indices in by_language.items():
+                results = self._ai_model.transcribe_batch([audios[i] for i in indices], language)
+                for i, result in zip(indices, results):
+                    texts[i] = result["text"].strip()
+                    confidences[i] = result_confidence(result)
+            # chunks longer than the 30 s window go through the regular sliding-window transcription
+            for i, audio in enumerate(audios):
+                if i not in batched:
+                    result = self._ai_model.transcribe(audio, batch[i][0].language)
+                    texts[i] = result["text"].strip()
+                    confidences[i] = result_confidence(result)
+            logger.debug(f"InferenceScheduler: decoded batch of {len(batch)} chunks")
+        except Exception as e:
+            logger.log(f"Error in Whisper batch transcription: {e}")
+
+        for (transcriber, chunk_audio), text, confidence in zip(batch, texts, confidences):
+            transcriber.complete_chunk(chunk_audio, text, confidence)
+        return True
@@ -0,0 +1,203 @@
+import itertools
+import os
+import time
+from dataclasses import dataclass, replace
+from queue import PriorityQueue, Empty
+from threading import Thread, Event, Lock
+from typing import Callable, List, Optional
+
+from ai_model import AiModel
+from configs import OutputConfig, TranscriberConfig
+from constants import *
+from file_listener import FileListener
+from logger import logger
+from model import ChunkTranscribed
+from output_writer import OutputWriter
+from transcriber import Transcriber
+
+
+@dataclass
+class TranscriptionJob:
+    file_path: str
+    output_name: str  # output file name without extension
+    priority: int = 0  # jobs with a higher priority start first, equal priorities start in the order they were added
+    status: str = jobStatusQueued
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+def collect_audio_files(paths: List[str]) -> List[str]:
+    """Files are taken as they are, directories are searched recursively for audio files"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in sorted(names)
+                             if name.lower().endswith(audioFileExtensions))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            logger.error(f"{path} does not exist")
+    return files
+
+
+class JobQueue:
+    """
+    Transcribes many files, up to max_concurrent at the same time.
+    Every job gets its own FileListener, Transcriber and output file.
+    Jobs which use the loaded model in this process share it and it decodes 1 segment at a time, so they run one by one.
+    Jobs run at the same time when each of them decodes on its own pool of worker processes (file_workers > 1).
+    A failed job is marked as failed and the queue continues with the next one.
+    stop() cancels waiting jobs and interrupts running ones, they can be resumed from their checkpoints later
+    """
+
+    def __init__(self, output_config: OutputConfig, transcriber_config: TranscriberConfig, ai_model: Optional[AiModel],
+                 max_concurrent: int = 1,
+                 on_job_update: Optional[Callable[[TranscriptionJob], None]] = None,
+                 on_finish: Optional[Callable[[], None]] = None,
+                 output_sink: Optional[Callable[[ChunkTranscribed], None]] = None):
+        self._output_config = output_config
+        self._transcriber_config = transcriber_config
+        self._ai_model = ai_model
+        self._max_concurrent = max(1, max_concurrent)
+        self._on_job_update = on_job_update
+        self._on_finish = on_finish
+        self._output_sink = output_sink  # gets the chunks of every job, see OutputWriter.add_sink()
+        self._pending = PriorityQueue()
+        self._order = itertools.count()  # keeps jobs with the same priority in FIFO order
+        self._jobs: List[TranscriptionJob] = []
+        self._listeners = {}  # running job -> FileListener
+        self._output_names = set()
+        self._lock = Lock()
+        self._cancelled = Event()
+        self._threads: List[Thread] = []
+        self._running_threads = 0
+
+    def add(self, file_path: str, priority: int = 0) -> TranscriptionJob:
+        with self._lock:
+            job = TranscriptionJob(file_path, self._get_output_name(file_path), priority)
+            self._jobs.append(job)
+        self._pending.put((-priority, next(self._order), job))
+        return job
+
+    def _get_output_name(self, file_path: str) -> str:
+        """Output file is named after the input file, inputs with the same name get a number"""
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        name = stem
+        number = 2
+        while name in self._output_names:
+            name = f"{stem}-{number}"
+            number += 1
+        self._output_names.add(name)
+        return name
+
+    def get_jobs(self) -> List[TranscriptionJob]:
+        with self._lock:
+            return list(self._jobs)
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs if job.status == status)
+
+    def start(self):
+        self._cancelled.clear()
+        pending = self._pending.qsize()
+        workers = min(self._max_concurrent, max(1, pending))
+        if workers > 1 and self._transcriber_config.use_ai and self._transcriber_config.file_workers <= 1:
+            # 1 model decodes 1 segment at a time, more jobs would only interleave their outputs
+            logger.log("JobQueue: jobs share 1 AI model, files are transcribed one by one."
+                       " Use more workers to transcribe files at the same time")
+            workers = 1
+        self._running_threads = workers
+        self._threads = [Thread(target=self._run, daemon=True) for _ in range(workers)]
+        logger.log(f"JobQueue start: {pending} files, {workers} at the same time")
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Cancel waiting jobs and interrupt running ones after their current segment. Doesn't wait for them"""
+        logger.log("JobQueue stopping")
+        self._cancelled.set()
+        with self._lock:
+            listeners = list(self._listeners.values())
+        for listener in listeners:
+            listener.stop()
+
+    def wait(self):
+        """Block until every job is finished, failed or cancelled"""
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    _, _, job = self._pending.get_nowait()
+                except Empty:
+                    break
+                if self._cancelled.is_set():
+                    self._set_status(job, jobStatusCancelled)
+                else:
+                    self._run_job(job)
+        finally:
+            with self._lock:
+                self._running_threads -= 1
+                finished = self._running_threads == 0
+            if finished:
+                self._log_summary()
+                if self._on_finish is not None:
+                    self._on_finish()
+
+    def _run_job(self, job: TranscriptionJob):
+        job.started_at = time.time()
+        self._set_status(job, jobStatusRunning)
+        try:
+            with self._lock:
+                # stop() sets it before it collects the listeners, so this job is either never started here
+                # or stopped there. The output file is created only for a job which isn't cancelled
+                listener = None if self._cancelled.is_set() else self._create_listener(job)
+                if listener is not None:
+                    self._listeners[id(job)] = listener
+                    listener.start()
+            if listener is not None:
+                listener.wait()
+                job.error = listener.error
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            with self._lock:
+                self._listeners.pop(id(job), None)
+        job.finished_at = time.time()
+        if job.error is not None:
+            logger.error(f"JobQueue: {job.file_path} failed: {job.error}")
+            self._set_status(job, jobStatusFailed)
+        elif self._cancelled.is_set():
+            self._set_status(job, jobStatusCancelled)
+        else:
+            logger.log(f"JobQueue: {job.file_path} done in {job.finished_at - job.started_at:.0f} sec")
+            self._set_status(job, jobStatusDone)
+
+    def _create_listener(self, job: TranscriptionJob) -> FileListener:
+        if not os.path.isfile(job.file_path):
+            raise ValueError(f"file {job.file_path} does not exist")
+        output_writer = OutputWriter(replace(self._output_config, file_name=job.output_name), None)
+        if self._output_sink is not None:
+            output_writer.add_sink(self._output_sink)
+        transcription_index = output_writer.start_new_file()
+        transcriber_config = replace(self._transcriber_config, transcription_index=transcription_index)
+        transcriber = Transcriber(output_writer, transcriber_config, self._ai_model)
+        transcriber.init()
+        listener = FileListener(transcriber)
+        listener.set_input_file(job.file_path)
+        return listener
+
+    def _set_status(self, job: TranscriptionJob, status: str):
+        job.status = status
+        if self._on_job_update is not None:
+            self._on_job_update(job)
+
+    def _log_summary(self):
+        counts = ", ".join(f"{status} {self.count(status)}"
+                           for status in (jobStatusDone, jobStatusFailed, jobStatusCancelled))
+        logger.log(f"JobQueue finished: {counts}")
@@ -0,0 +1,93 @@
+import tkinter as tk
+from collections import deque
+from tkinter import ttk, font
+from typing import List
+
+
+class LogView:
+    """
+    Log panel for long sessions. Keeps only the last max_lines lines in memory and the Text widget holds
+    only the lines which are visible, the scrollbar moves over the kept lines.
+    While scrolled to the bottom new lines are followed, otherwise the view stays on the same lines
+    """
+
+    def __init__(self, parent, max_lines: int, height: int = 10):
+        self._lines = deque(maxlen=max_lines)
+        self._first_visible = 0  # index in _lines of the top line of the view
+        self._follow = True
+        self._height = height
+
+        self.frame = ttk.Frame(parent)
+        # lines are not wrapped, so 1 log line is 1 row and the visible lines are easy to count
+        self._text = tk.Text(self.frame, height=height, wrap=tk.NONE, state="disabled")
+        self._scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        x_scrollbar = ttk.Scrollbar(self.frame, orient="horizontal", command=self._text.xview)
+        self._text.configure(xscrollcommand=x_scrollbar.set)
+        x_scrollbar.pack(side="bottom", fill="x")
+        self._scrollbar.pack(side="right", fill="y")
+        self._text.pack(side="left", fill="both", expand=True)
+
+        self._text.bind("<Configure>", lambda event: self._render())
+        self._text.bind("<MouseWheel>", self._on_mouse_wheel)  # Windows and macOS
+        self._text.bind("<Button-4>", lambda event: self._on_mouse_wheel(event, -3))  # Linux
+        self._text.bind("<Button-5>", lambda event: self._on_mouse_wheel(event, 3))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def append(self, lines: List[str]):
+        dropped = max(0, len(self._lines) + len(lines) - self._lines.maxlen)
+        self._lines.extend(lines)
+        if self._follow:
+            self._first_visible = self._last_first_visible()
+        else:
+            # the oldest lines were dropped, keep showing the same lines
+            self._first_visible = max(0, self._first_visible - dropped)
+        self._render()
+
+    def _visible_count(self) -> int:
+        widget_height = self._text.winfo_height()
+        if widget_height <= 1:  # not drawn yet
+            return self._height
+        line_height = font.nametofont(self._text.cget("font")).metrics("linespace")
+        return max(1, widget_height // line_height)
+
+    def _last_first_visible(self) -> int:
+        return max(0, len(self._lines) - self._visible_count())
+
+    def _render(self):
+        visible_count = self._visible_count()
+        visible = [self._lines[i] for i in range(self._first_visible,
+                                                 min(len(self._lines), self._first_visible + visible_count))]
+        self._text.configure(state="normal")
+        self._text.delete("1.0", "end")
+        self._text.insert("end", "\n".join(visible))
+        self._text.configure(state="disabled")
+
+        total = len(self._lines)
+        if total == 0:
+            self._scrollbar.set(0.0, 1.0)
+        else:
+            self._scrollbar.set(self._first_visible / total, min(1.0, (self._first_visible + visible_count) / total))
+
+    def _scroll_to(self, first_visible: int):
+        last = self._last_first_visible()
+        self._first_visible = min(max(0, first_visible), last)
+        self._follow = self._first_visible >= last
+        self._render()
+
+    def _scroll_lines(self, count: int):
+        self._scroll_to(self._first_visible + count)
+
+    def _on_scroll(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * len(self._lines)))
+        elif args[0] == "scroll":
+            step = self._visible_count() if args[2] == "pages" else 1
+            self._scroll_lines(int(args[1]) * step)
+
+    def _on_mouse_wheel(self, event, lines: int = 0):
+        if not lines:
+            lines = -3 if event.delta > 0 else 3
+        self._scroll_lines(lines)
+        return "break"  # the Text widget would scroll its own few lines too
@@ -1,9 +1,39 @@
+import atexit
+import logging
+import os
+import sys
+from logging.handlers import RotatingFileHandler
 from datetime import datetime
+from queue import SimpleQueue, Empty
+from threading import Thread, Lock
+from typing import Optional
+
+from constants import logFileMaxBytes, logFileBackupCount
+
+logLevelDebug = 10  # per chunk lines
+logLevelInfo = 20
+logLevelError = 40
+
 
 class Logger:
+    """
+    log() only formats the message and puts it into a queue, so audio, transcriber and writer threads never wait
+    for the console or the GUI. Records are drained in batches: by the GUI main loop after drain_externally(),
+    otherwise by a background thread which starts with the first record
+    """
+
     def __init__(self):
-        self._log_func = None
+        self._log_func = None  # receives the list of formatted lines of 1 batch
         self._show_error_func = None
+        self.level = logLevelInfo
+        self._records = SimpleQueue()
+        self._held_records = []  # taken from the queue but not written yet, they go before the queued ones
+        self._drain_lock = Lock()
+        self._thread_lock = Lock()
+        self._external_drain = False
+        self._drain_thread = None
+        self._file_handler: Optional[RotatingFileHandler] = None
+        atexit.register(self.drain)
 
     def set_log_func(self, log_func):
         self._log_func = log_func
@@ -11,20 +41,105 @@ class Logger:
     def set_show_error_func(self, show_error_func):
         self._show_error_func = show_error_func
 
+    def set_log_file(self, file_path: str, max_bytes: int = logFileMaxBytes, backup_count: int = logFileBackupCount):
+        """Every record is also written into the file, which is rotated when it reaches max_bytes"""
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            handler = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        except OSError as e:
+            self.error(f"Can't write the log file {file_path}: {e}")
+            return
+        # the lines already start with their time
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        with self._drain_lock:
+            if self._file_handler is not None:
+                self._file_handler.close()
+            self._file_handler = handler
+
+    def set_level(self, level: int):
+        self.level = level
+
+    def drain_externally(self):
+        """
+        The caller drains the records itself, e.g. from root.after, so log_func runs on the Tk main thread.
+        Call it before set_log_func(): the drain thread checks it under the drain lock, so after it returns
+        the drain thread doesn't write anything anymore
+        """
+        with self._drain_lock:
+            self._external_drain = True
+
+    def debug(self, message: str):
+        self._put(logLevelDebug, message)
+
     def log(self, message: str):
-        current_time = datetime.now().strftime("%M:%S")
-        formatted_message = f"{current_time}: {message}"
-        print(formatted_message)
-        if self._log_func is not None:
-            self._log_func(formatted_message)
+        self._put(logLevelInfo, message)
 
     def error(self, message: str):
-        self.log(f"ERROR: {message}")
+        self._put(logLevelError, f"ERROR: {message}")
 
     def show_error(self, message: str):
-        self.error(message)
-        if self._show_error_func is not None:
-            self._show_error_func(message)
+        self._put(logLevelError, f"ERROR: {message}", message)
+
+    def _put(self, level: int, message: str, error_to_show=None):
+        if level < self.level:
+            return
+        current_time = datetime.now().strftime("%M:%S")
+        self._records.put((f"{current_time}: {message}", error_to_show))
+        if not self._external_drain and self._drain_thread is None:
+            self._start_drain_thread()
+
+    def _start_drain_thread(self):
+        with self._thread_lock:
+            if self._drain_thread is None:
+                self._drain_thread = Thread(target=self._drain_loop, daemon=True)
+                self._drain_thread.start()
+
+    def _drain_loop(self):
+        while True:
+            record = self._records.get()  # SimpleQueue.put() never waits for this get(), so logging stays cheap
+            with self._drain_lock:
+                self._held_records.append(record)
+                if self._external_drain:
+                    # the GUI took over, log_func must be called from its main loop. The record stays held,
+                    # so it is written before the records which were queued after it
+                    return
+                records = self._write_records(1000)
+                show_error_func = self._show_error_func
+            self._show_errors(records, show_error_func)
+
+    def drain(self, max_records: int = 1000):
+        """Print and show up to max_records queued records as 1 batch. Returns the number of drained records"""
+        with self._drain_lock:
+            records = self._write_records(max_records)
+            show_error_func = self._show_error_func
+        self._show_errors(records, show_error_func)
+        return len(records)
+
+    def _write_records(self, max_records: int) -> list:
+        """Called with the drain lock held, takes the held records first"""
+        records = self._held_records[:max_records]
+        del self._held_records[:max_records]
+        while len(records) < max_records:
+            try:
+                records.append(self._records.get_nowait())
+            except Empty:
+                break
+        if records:
+            lines = [line for line, _ in records]
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+            if self._file_handler is not None:
+                for line in lines:
+                    self._file_handler.emit(logging.makeLogRecord({"msg": line}))
+            if self._log_func is not None:
+                self._log_func(lines)
+        return records
 
+    def _show_errors(self, records: list, show_error_func):
+        # the error dialog may wait for the user, so it is shown without the drain lock
+        if show_error_func is not None:
+            for _, error_to_show in records:
+                if error_to_show is not None:
+                    show_error_func(error_to_show)
 
-logger = Logger()
\ No newline at end of file
+logger = Logger()
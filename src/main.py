@@ -1,17 +1,28 @@
+import time
+
+# measured from the first import, so the startup time includes loading all modules
+startup_started_at = time.perf_counter()
+
 import tkinter as tk
+import multiprocessing
 import os
+import threading
+from typing import List, Optional
 
 from audio_listener import AudioListener
-from file_listener import FileListener
+from job_queue import JobQueue, TranscriptionJob
 from configs import OutputConfig, TranscriberConfig, AudioListenerConfig
 from constants import *
 from gui_renderer import MainProps, LiveListenProps, FileListenProps, OutputProps, RecognizerProps, StatusProps, LogsProps, GuiRenderer
 from actions import TranscriberActions
 from logger import Logger, logger
 from model import InputMode, ListenerBase
-from ai_model import AiModel
+from model_registry import ModelRegistry
+from inference_scheduler import InferenceScheduler
 from transcriber import Transcriber
+from pipeline_metrics import metrics, MetricsServer
 from output_writer import OutputWriter
+from output_stream import OutputStreamServer
 
 
 class TranscriberApp:
@@ -22,7 +33,13 @@ class TranscriberApp:
         
         # State variables
         self.logger = Logger()
-        self.listeners = []
+        self.listeners: List[ListenerBase] = []
+        self.transcribers = []
+        self.inference_scheduler = None
+        self.job_queue: Optional[JobQueue] = None
+        self.metrics_server = None
+        self.output_stream = None
+        self.model_registry = ModelRegistry(modelMemoryBudgetMb)
 
         # Initialize base directories
         base_directory = os.path.dirname(os.path.abspath(__file__))
@@ -47,6 +64,10 @@ class TranscriberApp:
         self.actions = TranscriberActions()
         self.actions.start_transcribing = self._start_transcribing
         self.actions.stop_transcribing = self._stop_transcribing
+        self.actions.preload_model = self._preload_model
+        self.actions.export_stats = metrics.export_json
+        self.actions.toggle_metrics_server = self._toggle_metrics_server
+        self.actions.toggle_output_stream = self._toggle_output_stream
 
         # Initialize GUI
         self.gui = GuiRenderer(
@@ -61,13 +82,10 @@ class TranscriberApp:
             actions=self.actions
         )
 
-        # Setup logging
-        def log(message):
-            self.logs_props.logs_text.configure(state="normal")
-            self.logs_props.logs_text.insert("end", f"{message}\n")
-            self.logs_props.logs_text.see("end")  # Auto-scroll to the bottom
-            self.logs_props.logs_text.configure(state="disabled")
-        logger.set_log_func(log)
+        # Setup logging, records of all threads are drained in batches on the Tk main loop.
+        # The drain thread stops first, so it never calls into Tk. Records stay queued until the log view exists
+        logger.drain_externally()
+        logger.set_log_file(os.path.join(tmp_directory, "logs", "transcriber.log"))
 
         def show_error(message):
             tk.messagebox.showerror("Error", message)
@@ -75,6 +93,67 @@ class TranscriberApp:
 
         # Render GUI
         self.gui.render_all()
+        logger.set_log_func(self.logs_props.log_view.append)
+
+        # Load the selected AI model in background, so Start doesn't wait for it
+        self._preload_model()
+
+        self.root.after_idle(self._log_startup_time)
+        self._drain_logs()
+
+    def _drain_logs(self):
+        logger.drain()
+        self.root.after(logDrainInterval, self._drain_logs)
+
+    def _log_startup_time(self):
+        logger.log(f"Startup took {time.perf_counter() - startup_started_at:.2f} sec")
+
+    def _get_selected_model_name(self) -> str:
+        return self.recognizer_props.selected_ai_model.get().split(" - ")[0]
+
+    def _preload_model(self):
+        if not self.recognizer_props.use_ai.get() or self.status_props.transcribing:
+            return
+        if self.main_props.input_mode.get() == InputMode.FILE.value and self._get_file_workers() > 1:
+            return  # the worker processes load the model
+        selection = self.recognizer_props.selected_ai_model.get()
+        if not selection or "to download" in selection:
+            return
+        model_name = self._get_selected_model_name()
+
+        def on_loaded(ai_model):
+            if not self.status_props.transcribing:
+                self.status_props.status.set(f"{statusReady} (model {model_name} is loaded)")
+
+        def on_error(error):
+            if not self.status_props.transcribing:
+                self.status_props.status.set(f"Failed to load model {model_name}: {error}")
+
+        self._load_model_async(model_name, on_loaded, on_error)
+
+    def _load_model_async(self, model_name: str, on_loaded, on_error):
+        """Get the model from the registry on a background thread, callbacks are called on the Tk main loop"""
+        tmp_directory = self.output_props.tmp_directory.get()
+        memory_budget_mb = self._get_model_memory_mb()
+
+        def show_progress(message):
+            def update_status():
+                if not self.status_props.transcribing:
+                    self.status_props.status.set(message)
+            self.root.after(0, update_status)
+
+        def load():
+            try:
+                # the registry lock is held while another model loads, so not on the Tk main loop
+                self.model_registry.set_memory_budget(memory_budget_mb)
+                ai_model = self.model_registry.get(model_name, tmp_directory, show_progress)
+                self.root.after(0, lambda: on_loaded(ai_model))
+            except Exception as e:
+                logger.error(f"Failed to load model {model_name}: {e}")
+                error = str(e)
+                self.root.after(0, lambda: on_error(error))
+
+        threading.Thread(target=load, daemon=True).start()
 
     def _start_transcribing(self):
         transcribing_file = self.main_props.input_mode.get() == InputMode.FILE.value
@@ -82,68 +161,135 @@ class TranscriberApp:
             logger.show_error("File transcribing is only available with AI")
             return
 
+        if not self.recognizer_props.use_ai.get():
+            self._start_session(None)
+            return
+        if transcribing_file and self._get_file_workers() > 1:
+            # each worker process loads its own copy of the model, this process doesn't decode
+            self._start_session(None)
+            return
+
+        # the model may still be loading, wait for it without blocking the Tk main loop
+        self.status_props.start_button.configure(state="disabled")
+
+        def on_loaded(ai_model):
+            self.status_props.start_button.configure(state="normal")
+            self._start_session(ai_model)
+
+        def on_error(error):
+            self.status_props.start_button.configure(state="normal")
+            logger.show_error(f"Failed to start transcription: {error}")
+            self.set_initial_state()
+
+        self._load_model_async(self._get_selected_model_name(), on_loaded, on_error)
+
+    def _get_model_memory_mb(self) -> int:
+        value = self.recognizer_props.model_memory_mb.get()
         try:
-            output_config = OutputConfig(self.output_props.output_directory.get())
-            output_writer = OutputWriter(output_config, self.set_initial_state)
-            transcription_index = output_writer.start_new_file()
+            return max(0, int(value))
+        except ValueError:
+            logger.error(f"Models RAM '{value}' is not a number of MB, using {modelMemoryBudgetMb} MB")
+            self.recognizer_props.model_memory_mb.set(str(modelMemoryBudgetMb))
+            return modelMemoryBudgetMb
 
-            use_ai = self.recognizer_props.use_ai.get()
-            model_name = self.recognizer_props.selected_ai_model.get().split(" - ")[0] if self.recognizer_props.use_ai.get() else None
+    def _get_file_workers(self) -> int:
+        value = self.file_listen_props.workers.get()
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logger.error(f"Workers '{value}' is not a number, using {fileWorkersDefault}")
+            self.file_listen_props.workers.set(str(fileWorkersDefault))
+            return fileWorkersDefault
 
-            self.listeners = []
+    def _start_session(self, ai_model):
+        transcribing_file = self.main_props.input_mode.get() == InputMode.FILE.value
+        try:
+            model_name = self._get_selected_model_name() if self.recognizer_props.use_ai.get() else None
 
-            if use_ai:
-                ai_model = AiModel(model_name, self.output_props.tmp_directory.get())
-                ai_model.load()
-            else:
-                ai_model = None
+            streaming = self.recognizer_props.streaming.get()
+            metrics.reset()
+            self.listeners = []
+            self.transcribers = []
 
             if transcribing_file:
+                if not self.file_listen_props.selected_files:
+                    raise ValueError("No input files selected")
                 transcriber_config = TranscriberConfig(
                     recogniser_name=self.recognizer_props.selected_recognizer.get(),
                     tmp_directory=self.output_props.tmp_directory.get(),
                     use_ai=self.recognizer_props.use_ai.get(),
                     model_name=model_name,
-                    transcription_index=transcription_index,
-                    speaker_name=""
+                    transcription_index=0,
+                    speaker_name="",
+                    file_workers=self._get_file_workers()
                 )
-                transcriber = Transcriber(output_writer, transcriber_config, ai_model)
-                transcriber.init()
-
-                listener = FileListener(transcriber)
-                listener.set_input_file(self.file_listen_props.selected_file.get())
-                self.listeners.append(listener)
+                # every file is written into its own output file named after the input file
+                job_queue = JobQueue(
+                    OutputConfig(self.output_props.output_directory.get()),
+                    transcriber_config,
+                    ai_model,
+                    max(1, int(self.file_listen_props.concurrent_jobs.get() or 1)),
+                    on_job_update=lambda job: self.root.after(0, self._update_jobs_status),
+                    on_finish=lambda: self.root.after(0, self.set_initial_state),
+                    output_sink=self._publish_output
+                )
+                for file_path in self.file_listen_props.selected_files:
+                    job_queue.add(file_path)
+                self.job_queue = job_queue
             else:
+                output_config = OutputConfig(self.output_props.output_directory.get())
+                output_writer = OutputWriter(output_config, self.set_initial_state)
+                output_writer.add_sink(self._publish_output)
+                transcription_index = output_writer.start_new_file()
+
+                if ai_model is not None and not streaming:
+                    # one scheduler owns the model and batches chunks of all speakers
+                    self.inference_scheduler = InferenceScheduler(ai_model)
+                    self.inference_scheduler.start()
+
                 # Create listeners for each enabled input line
                 for input_line in self.live_listen_props.audio_input_lines:
+                    if not input_line.record and not input_line.transcribe:
+                        continue
                     transcriber_config = TranscriberConfig(
                         recogniser_name=self.recognizer_props.selected_recognizer.get(),
                         tmp_directory=self.output_props.tmp_directory.get(),
                         use_ai=self.recognizer_props.use_ai.get(),
                         model_name=model_name,
                         transcription_index=transcription_index,
-                        speaker_name=input_line.speaker_name
+                        speaker_name=input_line.speaker_name,
+                        streaming=streaming,
+                        overflow_policy=self.recognizer_props.overflow_policy.get()
                     )
-                    transcriber = Transcriber(output_writer, transcriber_config, ai_model)
+                    # every transcriber is a source of the output writer, which closes the file when all of them stop
+                    transcriber = Transcriber(output_writer, transcriber_config, ai_model, self.inference_scheduler)
                     transcriber.init()
 
-                    if input_line.record or input_line.transcribe:
-                        audio_config = AudioListenerConfig(
-                            input_line=input_line,
-                            chunk_duration=int(self.recognizer_props.chunk_duration.get()),
-                            transcription_index=transcription_index
-                        )
-                        listener = AudioListener(transcriber, audio_config)
-                        self.listeners.append(listener)
+                    audio_config = AudioListenerConfig(
+                        input_line=input_line,
+                        chunk_duration=int(self.recognizer_props.chunk_duration.get()),
+                        transcription_index=transcription_index,
+                        use_vad=self.recognizer_props.use_vad.get(),
+                        streaming=streaming
+                    )
+                    listener = AudioListener(transcriber, audio_config)
+                    self.listeners.append(listener)
+                    if input_line.transcribe:
+                        self.transcribers.append(transcriber)
 
             for listener in self.listeners:
                 listener.start()
+            if self.job_queue is not None:
+                self.job_queue.start()
 
             self.status_props.status.set(statusTranscribing)
             self.status_props.transcribing = True
             self.status_props.start_button.configure(text="Stop")
+            self._update_lag_status()
+            self._update_stats()
         except Exception as e:
             logger.show_error(f"Failed to start transcription: {str(e)}")
+            self._stop_inference_scheduler()
             self.set_initial_state()
 
     def _stop_transcribing(self):
@@ -151,17 +297,90 @@ class TranscriberApp:
         for listener in self.listeners:
             listener.stop()
         self.listeners = []
+        if self.job_queue is not None:
+            self.job_queue.stop()
+        self._stop_inference_scheduler()
+
+    def _update_jobs_status(self):
+        if self.job_queue is None or not self.status_props.transcribing:
+            return
+        jobs = self.job_queue.get_jobs()
+        finished = sum(1 for job in jobs if job.status in (jobStatusDone, jobStatusFailed, jobStatusCancelled))
+        failed = self.job_queue.count(jobStatusFailed)
+        status = f"{statusTranscribing} ({finished}/{len(jobs)} files finished"
+        if failed:
+            status += f", {failed} failed"
+        if self.status_props.status.get().startswith(statusTranscribing):
+            self.status_props.status.set(status + ")")
+
+    def _update_lag_status(self):
+        """Show how many seconds each speaker's transcription is behind real time"""
+        if not self.status_props.transcribing or not self.transcribers:
+            return
+        lags = ", ".join(f"{t.speaker_name}: {t.get_lag():.1f}s" for t in self.transcribers)
+        if self.status_props.status.get().startswith(statusTranscribing):
+            self.status_props.status.set(f"{statusTranscribing} (behind real time - {lags})")
+        self.root.after(1000, self._update_lag_status)
+
+    def _update_stats(self):
+        self.status_props.stats.set("\n".join(metrics.format_summary()))
+        if self.status_props.transcribing:
+            self.root.after(1000, self._update_stats)
+
+    def _toggle_metrics_server(self):
+        if self.status_props.serve_metrics.get():
+            try:
+                self.metrics_server = MetricsServer(metrics, metricsServerPort)
+                self.metrics_server.start()
+            except OSError as e:
+                self.metrics_server = None
+                self.status_props.serve_metrics.set(False)
+                logger.show_error(f"Can't serve metrics on port {metricsServerPort}: {e}")
+        elif self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+    def _toggle_output_stream(self):
+        if self.output_props.stream_output.get():
+            try:
+                output_stream = OutputStreamServer(outputStreamPort)
+                output_stream.start()
+                self.output_stream = output_stream
+            except OSError as e:
+                self.output_props.stream_output.set(False)
+                logger.show_error(f"Can't stream lines on port {outputStreamPort}: {e}")
+        elif self.output_stream is not None:
+            self.output_stream.stop()
+            self.output_stream = None
+
+    def _publish_output(self, chunk):
+        """Sink of every output writer, so the stream can be switched on and off while transcribing"""
+        output_stream = self.output_stream
+        if output_stream is not None:
+            output_stream.publish(chunk)
+
+    def _stop_inference_scheduler(self):
+        if self.inference_scheduler is not None:
+            self.inference_scheduler.stop()
+            self.inference_scheduler = None
 
     def set_initial_state(self):
         self.listeners = []
+        self.job_queue = None
+        self.transcribers = []
         self.status_props.transcribing = False
         self.status_props.status.set(statusReady)
         self.status_props.start_button.configure(text="Start")
 
 def main():
+    # file transcription workers are separate processes, required for the PyInstaller build
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = TranscriberApp(root)
     root.mainloop()
+    # the widgets are destroyed, the remaining records only go to the console
+    logger.set_log_func(None)
+    logger.set_show_error_func(None)
 
 
 if __name__ == "__main__":
@@ -18,15 +18,33 @@ class AudioDeviceWrapper:
         return f"{self.type}: {self.device['name']} ({self.device['hostapi']})"
 
 class ChunkAudio:
-    def __init__(self, index: int, data):
+    def __init__(self, index: int, data, sample_rate: int = 16000, captured_at: Optional[float] = None,
+                 capture_start: Optional[float] = None):
         self.index = index
         self.data = data
+        self.sample_rate = sample_rate
+        self.captured_at = captured_at  # time.time() when the last sample of the chunk was captured
+        self.capture_start = capture_start  # time.time() when the first sample of the chunk was captured
+        # time.time() of the pipeline stages, used for the stage latency metrics
+        self.queued_at: Optional[float] = None
+        self.decode_started_at: Optional[float] = None
+        self.decoded_at: Optional[float] = None
+        self.written_at: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return self.data.shape[0] / self.sample_rate
 
 class ChunkTranscribed:
-    def __init__(self, index: int, text: str, speaker_name: Optional[str] = None):
+    def __init__(self, index: int, text: str, speaker_name: Optional[str] = None,
+                 start: Optional[float] = None, end: Optional[float] = None, confidence: Optional[float] = None):
         self.index = index
         self.text = text
         self.speaker_name = speaker_name
+        # seconds from the beginning of the file, or of the output file session for live audio
+        self.start = start
+        self.end = end
+        self.confidence = confidence  # 0..1, reported by Whisper only
 
 class InputMode(Enum):
     LIVE = "Live"
@@ -38,6 +56,7 @@ class AudioInputLine:
     speaker_name: str
     record: bool
     transcribe: bool
+    channel: Optional[int] = None  # 0-based channel of a multichannel input device, None for the default stream
 
 class ListenerBase:
     def start(self):
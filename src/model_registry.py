@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Optional
+
+from ai_model import AiModel
+from logger import logger
+
+
+class ModelRegistry:
+    """
+    Keeps loaded AI models in memory between Start/Stop sessions, so the next session starts transcribing immediately.
+    When the loaded models exceed the RAM budget, the least recently used ones are evicted.
+    An evicted model is freed once the sessions which still use it are finished
+    """
+
+    def __init__(self, memory_budget_mb: int):
+        self._memory_budget = memory_budget_mb * 1024 * 1024
+        self._models = OrderedDict()  # (model name, tmp directory) -> AiModel, least recently used first
+        self._lock = Lock()
+
+    def get(self, model_name: str, tmp_directory: str,
+            on_progress: Optional[Callable[[str], None]] = None) -> AiModel:
+        """Returns the loaded and warmed up model, loads it if needed. on_progress receives status messages"""
+        key = (model_name, tmp_directory)
+        with self._lock:
+            ai_model = self._models.get(key)
+            if ai_model is not None:
+                self._models.move_to_end(key)
+                logger.log(f"ModelRegistry: reusing loaded model '{model_name}'")
+                return ai_model
+
+            ai_model = AiModel(model_name, tmp_directory)
+            if on_progress is not None:
+                on_progress(f"Loading model {model_name}...")
+            ai_model.load()
+            if on_progress is not None:
+                on_progress(f"Warming up model {model_name}...")
+            ai_model.warm_up()
+            self._models[key] = ai_model
+            self._evict()
+            return ai_model
+
+    def set_memory_budget(self, memory_budget_mb: int):
+        """Models over the new budget are evicted right away"""
+        with self._lock:
+            self._memory_budget = memory_budget_mb * 1024 * 1024
+            self._evict()
+
+    def _evict(self):
+        total_size = sum(ai_model.get_memory_size() for ai_model in self._models.values())
+        # the model which was just requested always stays
+        while total_size > self._memory_budget and len(self._models) > 1:
+            (model_name, _), ai_model = self._models.popitem(last=False)
+            total_size -= ai_model.get_memory_size()
+            logger.log(f"ModelRegistry: evicted model '{model_name}' to stay within the memory budget")
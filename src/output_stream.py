@@ -0,0 +1,131 @@
+import json
+import socket
+from collections import deque
+from threading import Lock, Condition, Thread
+from typing import List, Optional
+
+from constants import outputStreamMaxBuffered
+from logger import logger
+from model import ChunkTranscribed
+
+
+class _Subscriber:
+    def __init__(self, connection: socket.socket, address, max_buffered: int):
+        self.connection = connection
+        self.name = f"{address[0]}:{address[1]}"
+        self.records = deque(maxlen=max_buffered)  # encoded lines, the oldest are dropped when it is full
+        self.condition = Condition()
+        self.dropped = 0
+        self.closed = False
+
+
+class OutputStreamServer:
+    """
+    Pushes transcribed chunks to local subscribers as JSON lines over TCP on localhost, 1 record per line:
+    speaker, index, start, end, text and confidence.
+    publish() only appends the encoded record to a bounded buffer of each subscriber and a sender thread per
+    subscriber writes it to the socket. A slow subscriber loses its oldest records and never holds the
+    transcription back. Records are pushed as soon as they are transcribed, before the output file reorders
+    the speakers, so start tells the order
+    """
+
+    def __init__(self, port: int, max_buffered: int = outputStreamMaxBuffered):
+        self.port = port
+        self.max_buffered = max_buffered
+        self._server_socket: Optional[socket.socket] = None
+        self._accept_thread: Optional[Thread] = None
+        self._subscribers_lock = Lock()
+        self._subscribers: List[_Subscriber] = []
+
+    def start(self):
+        # only localhost, the records contain speaker names and the transcribed text
+        self._server_socket = socket.create_server(("127.0.0.1", self.port))
+        self._accept_thread = Thread(target=self._accept_subscribers, args=(self._server_socket,), daemon=True)
+        self._accept_thread.start()
+        logger.log(f"OutputStreamServer: streaming lines on 127.0.0.1:{self.port}")
+
+    def publish(self, chunk: ChunkTranscribed):
+        """OutputWriter sink, called from transcriber threads. Encodes the record once for all subscribers"""
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        record = {
+            "speaker": chunk.speaker_name,
+            "index": chunk.index,
+            "start": chunk.start,
+            "end": chunk.end,
+            "text": chunk.text,
+            "confidence": chunk.confidence,
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        for subscriber in subscribers:
+            with subscriber.condition:
+                if len(subscriber.records) == subscriber.records.maxlen:
+                    subscriber.dropped += 1
+                subscriber.records.append(line)
+                subscriber.condition.notify()
+
+    def _accept_subscribers(self, server_socket: socket.socket):
+        while True:
+            try:
+                connection, address = server_socket.accept()
+            except OSError:
+                return  # the server socket is closed by stop()
+            # records are small, send each one right away instead of waiting to fill a packet
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            subscriber = _Subscriber(connection, address, self.max_buffered)
+            with self._subscribers_lock:
+                self._subscribers.append(subscriber)
+            Thread(target=self._send_records, args=(subscriber,), daemon=True).start()
+            logger.log(f"OutputStreamServer: subscriber {subscriber.name} connected")
+
+    def _send_records(self, subscriber: _Subscriber):
+        try:
+            while True:
+                with subscriber.condition:
+                    while not subscriber.records and not subscriber.closed:
+                        subscriber.condition.wait()
+                    if subscriber.closed:
+                        return
+                    lines = list(subscriber.records)
+                    subscriber.records.clear()
+                # records which arrived together are sent with 1 call
+                subscriber.connection.sendall(b"".join(lines))
+        except OSError:
+            pass  # the subscriber disconnected
+        finally:
+            self._remove_subscriber(subscriber)
+
+    def _remove_subscriber(self, subscriber: _Subscriber):
+        with self._subscribers_lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.remove(subscriber)
+        with subscriber.condition:
+            subscriber.closed = True
+            subscriber.condition.notify()
+        _close_socket(subscriber.connection)
+        message = f"OutputStreamServer: subscriber {subscriber.name} disconnected"
+        if subscriber.dropped:
+            message += f", {subscriber.dropped} records were dropped because it was too slow"
+        logger.log(message)
+
+    def stop(self):
+        if self._server_socket is not None:
+            _close_socket(self._server_socket)
+            self._server_socket = None
+            self._accept_thread = None
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._remove_subscriber(subscriber)
+
+
+def _close_socket(sock: socket.socket):
+    # shutdown() wakes a thread blocked in accept() or sendall() on Linux, close() alone doesn't
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
@@ -1,49 +1,138 @@
+import heapq
+import json
 import os
+import time
+from collections import deque
 from datetime import datetime
-from threading import Lock
-from typing import Optional, Callable
+from itertools import count
+from threading import Lock, Condition, Thread
+from typing import Optional, Callable, List, Dict
 
 from configs import OutputConfig
+from constants import outputFormatTxt, outputFormatSrt, outputFormatJson
 from logger import logger
 from model import ChunkTranscribed
 
+# seconds, how often lines held for reordering are checked against the sources' watermarks
+reorderCheckInterval = 0.1
+
 
 class OutputWriter:
+    """
+    write() only appends the chunk to an in-memory queue. A background thread formats the queued chunks and
+    writes them in bulk, the file is flushed every flush_interval seconds or when flush_size bytes are buffered,
+    and fsynced at checkpoint() and stop(). So transcriber threads never wait for the disk.
+
+    Speakers are decoded in parallel and finish in any order, so lines are held in a min-heap by start time.
+    Each source (transcriber) reports a watermark: the session time before which it won't write anything else.
+    A line is written when its start is below the watermarks of all sources, or after max_reorder_delay
+    """
+
     def __init__(self, config: OutputConfig, on_finish_callback):
         self.output_directory = config.output_directory
+        self.output_format = config.output_format
+        self.file_name = config.file_name
+        self.flush_interval = config.flush_interval
+        self.flush_size = config.flush_size
+        self.max_reorder_delay = config.max_reorder_delay
         self.on_finish_callback = on_finish_callback
-        self._lock = Lock()
+        self.started_at = time.time()  # time.time() at the start of the session, live line times count from it
+        self._file_lock = Lock()  # the current file, used by the writer thread, start_new_file() and stop()
         self._current_file = None
+        self._srt_cue_number = 0
+        self._srt_last_end = 0.0
+        self._json_entries = []  # json is written as 1 document when the file is closed
+        self._pending = deque()
+        self._pending_size = 0
+        self._pending_condition = Condition()
+        self._fsync_requested = False
+        self._should_stop = False
+        self._writer_thread: Optional[Thread] = None
+        self._unflushed_size = 0
+        self._last_flush_at = time.monotonic()
+        self._sources_lock = Lock()
+        self._sources: Dict[int, Optional[Callable[[], Optional[float]]]] = {}
+        self._source_ids = count(1)
+        self._reorder_heap = []  # (start, sequence number, time.monotonic() when queued, chunk), writer thread only
+        self._reorder_sequence = count()
+        self._sinks: List[Callable[[ChunkTranscribed], None]] = []
+
+    def add_sink(self, sink: Callable[[ChunkTranscribed], None]):
+        """
+        sink gets every chunk as soon as it is written, from the writer's caller thread, before the chunk reaches
+        the file. It must not block, e.g. OutputStreamServer.publish
+        """
+        self._sinks.append(sink)
+
+    def register_source(self, watermark_func: Optional[Callable[[], Optional[float]]] = None) -> int:
+        """
+        Add a source of chunks. watermark_func returns the session time before which the source won't write
+        any more chunks, or None when it doesn't hold other sources back. The file is closed when all sources stop
+        """
+        with self._sources_lock:
+            source_id = next(self._source_ids)
+            self._sources[source_id] = watermark_func
+        return source_id
+
+    def stop_source(self, source_id: int):
+        """The source won't write anymore, stop() when it was the last one"""
+        with self._sources_lock:
+            self._sources.pop(source_id, None)
+            last = not self._sources
+        if last:
+            self.stop()
 
     def get_output_directory(self) -> str:
         return self.output_directory
 
     def start_new_file(self) -> int:
         """Start a new transcription file"""
-        with self._lock:
-            if self._current_file is not None:
-                self._current_file.close()
-
-            # Create output directory if it doesn't exist
-            if not os.path.exists(self.output_directory):
-                os.makedirs(self.output_directory)
-
-            # Create new file
-            file_number = self._get_next_file_number()
-            filename = f"transcription-{file_number}.txt"
-            filepath = os.path.join(self.output_directory, filename)
-            try:
-                self._current_file = open(filepath, "w", encoding="utf-8")
+        with self._file_lock:
+            self.started_at = time.time()
+            return self._open_new_file()
+
+    def _open_new_file(self) -> int:
+        if self._current_file is not None:
+            self._close_current_file()
+
+        # Create output directory if it doesn't exist
+        if not os.path.exists(self.output_directory):
+            os.makedirs(self.output_directory)
+
+        # Create new file
+        file_number = self._get_next_file_number()
+        filename = self._get_file_name(file_number)
+        filepath = os.path.join(self.output_directory, filename)
+        try:
+            # the file buffer holds what is written between flushes, "x" never truncates an existing transcript
+            self._current_file = open(filepath, "x", encoding="utf-8", buffering=max(self.flush_size, 8192))
+            if self.output_format == outputFormatTxt:
                 self._current_file.write(f"Transcription started at {datetime.now()}\n\n")
-                logger.log(f"Created new transcription file: {filename}")
-            except Exception as e:
-                logger.error(f"Error creating transcription file: {e}")
-                raise e
+            self._srt_cue_number = 0
+            self._srt_last_end = 0.0
+            self._json_entries = []
+            self._unflushed_size = 0
+            self._last_flush_at = time.monotonic()
+            logger.log(f"Created new transcription file: {filename}")
+        except Exception as e:
+            logger.error(f"Error creating transcription file: {e}")
+            raise e
         return file_number
 
+    def _get_file_name(self, file_number: int) -> str:
+        if not self.file_name:
+            return f"transcription-{file_number}.{self.output_format}"
+        # an earlier transcript with the same name gets a number, e.g. of the same file or of a.wav after a.mp3
+        filename = f"{self.file_name}.{self.output_format}"
+        number = 2
+        while os.path.exists(os.path.join(self.output_directory, filename)):
+            filename = f"{self.file_name}-{number}.{self.output_format}"
+            number += 1
+        return filename
+
     def _get_next_file_number(self):
         existing_files = [f for f in os.listdir(self.output_directory)
-                          if f.startswith("transcription-") and f.endswith(".txt")]
+                          if f.startswith("transcription-") and f.endswith(f".{self.output_format}")]
         if not existing_files:
             return 1
 
@@ -51,36 +140,178 @@ class OutputWriter:
         return max(numbers) + 1
 
     def write(self, chunk: ChunkTranscribed):
-        """Write a transcribed chunk to the current file"""
+        """Queue a transcribed chunk for the current file, doesn't wait for the disk"""
         if not chunk.text.strip():
             return
 
-        with self._lock:
-            if self._current_file is None:
-                self.start_new_file()
+        for sink in self._sinks:
+            sink(chunk)
+        with self._pending_condition:
+            self._pending.append(chunk)
+            self._pending_size += len(chunk.text)
+            if self._pending_size >= self.flush_size:
+                self._pending_condition.notify()
+        self._ensure_writer_thread()
+        logger.debug(f"OutputWriter {chunk.speaker_name}: chunk {chunk.index}")
+
+    def checkpoint(self):
+        """Ask the writer thread to write everything queued so far and fsync the file. Doesn't wait for it"""
+        with self._pending_condition:
+            self._fsync_requested = True
+            self._pending_condition.notify()
 
-            try:
-                # Format the text with speaker name if available
-                if chunk.speaker_name:
-                    text = f"{chunk.speaker_name}: {chunk.text}\n"
-                else:
-                    text = f"{chunk.text}\n"
+    def _ensure_writer_thread(self):
+        if self._writer_thread is None:
+            with self._pending_condition:
+                if self._writer_thread is None:
+                    self._should_stop = False
+                    self._writer_thread = Thread(target=self._run_writer, daemon=True)
+                    self._writer_thread.start()
 
-                self._current_file.write(text)
-                self._current_file.flush()
-                logger.log(f"OutputWriter {chunk.speaker_name}: chunk {chunk.index}")
-            except Exception as e:
-                logger.error(f"Error writing to transcription file: {e}")
+    def _run_writer(self):
+        while True:
+            with self._pending_condition:
+                if not self._pending and not self._should_stop and not self._fsync_requested:
+                    # held lines become ready when other sources move on, without any new write()
+                    self._pending_condition.wait(reorderCheckInterval if self._reorder_heap else self.flush_interval)
+                chunks = list(self._pending)
+                self._pending.clear()
+                self._pending_size = 0
+                fsync_requested = self._fsync_requested
+                self._fsync_requested = False
+                should_stop = self._should_stop
+
+            self._hold_chunks(chunks)
+            with self._file_lock:
+                try:
+                    self._write_chunks(self._pop_ready_chunks(final=should_stop))
+                    if fsync_requested:
+                        self._flush(fsync=True)
+                    elif (self._unflushed_size >= self.flush_size
+                          or time.monotonic() - self._last_flush_at >= self.flush_interval):
+                        self._flush(fsync=False)
+                except Exception as e:
+                    logger.error(f"Error writing to transcription file: {e}")
+            if should_stop:
+                return
+
+    def _hold_chunks(self, chunks: List[ChunkTranscribed]):
+        queued_at = time.monotonic()
+        for chunk in chunks:
+            start = chunk.start if chunk.start is not None else float("-inf")
+            heapq.heappush(self._reorder_heap, (start, next(self._reorder_sequence), queued_at, chunk))
+
+    def _pop_ready_chunks(self, final: bool) -> List[ChunkTranscribed]:
+        """Held chunks which no source can precede anymore, in start order"""
+        if not self._reorder_heap:
+            return []
+        release_until = float("inf") if final else self._get_watermark()
+        # lines held for too long are released together with everything that starts before them
+        deadline = time.monotonic() - self.max_reorder_delay
+        for start, _, queued_at, _ in self._reorder_heap:
+            if queued_at <= deadline and start > release_until:
+                release_until = start
+        ready = []
+        while self._reorder_heap and self._reorder_heap[0][0] <= release_until:
+            ready.append(heapq.heappop(self._reorder_heap)[3])
+        return ready
+
+    def _get_watermark(self) -> float:
+        with self._sources_lock:
+            watermark_funcs = [func for func in self._sources.values() if func is not None]
+        watermarks = [func() for func in watermark_funcs]
+        return min((watermark for watermark in watermarks if watermark is not None), default=float("inf"))
+
+    def _write_chunks(self, chunks: List[ChunkTranscribed]):
+        if not chunks:
+            return
+        if self._current_file is None:
+            self._open_new_file()
+        for chunk in chunks:
+            if self.output_format == outputFormatSrt:
+                text = self._format_srt(chunk)
+            elif self.output_format == outputFormatJson:
+                self._json_entries.append(self._format_json(chunk))
+                continue
+            else:
+                text = self._format_txt(chunk)
+            self._current_file.write(text)
+            self._unflushed_size += len(text)
+
+    def _flush(self, fsync: bool):
+        if self._current_file is None:
+            return
+        if self._unflushed_size or fsync:
+            self._current_file.flush()
+            if fsync:
+                os.fsync(self._current_file.fileno())
+        self._unflushed_size = 0
+        self._last_flush_at = time.monotonic()
+
+    def _format_txt(self, chunk: ChunkTranscribed) -> str:
+        # Format the text with speaker name if available
+        if chunk.speaker_name:
+            return f"{chunk.speaker_name}: {chunk.text}\n"
+        return f"{chunk.text}\n"
+
+    def _format_srt(self, chunk: ChunkTranscribed) -> str:
+        # live chunks have no timestamps, they continue where the previous cue ended
+        start = chunk.start if chunk.start is not None else self._srt_last_end
+        end = chunk.end if chunk.end is not None else start
+        self._srt_last_end = end
+        self._srt_cue_number += 1
+        return (f"{self._srt_cue_number}\n"
+                f"{self._format_srt_time(start)} --> {self._format_srt_time(end)}\n"
+                f"{self._format_txt(chunk)}\n")
+
+    def _format_srt_time(self, seconds: float) -> str:
+        milliseconds = int(round(seconds * 1000))
+        hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+        minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+        seconds, milliseconds = divmod(milliseconds, 1000)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+    def _format_json(self, chunk: ChunkTranscribed) -> dict:
+        return {
+            "index": chunk.index,
+            "speaker": chunk.speaker_name,
+            "start": chunk.start,
+            "end": chunk.end,
+            "text": chunk.text,
+            "confidence": chunk.confidence,
+        }
+
+    def _close_current_file(self):
+        if self.output_format == outputFormatTxt:
+            self._current_file.write(f"\nTranscription ended at {datetime.now()}\n")
+        elif self.output_format == outputFormatJson:
+            json.dump(self._json_entries, self._current_file, ensure_ascii=False, indent=2)
+        self._flush(fsync=True)
+        self._current_file.close()
+        self._current_file = None
 
     def stop(self):
-        """Close the current transcription file"""
-        with self._lock:
-            if self._current_file is not None:
+        """Write the queued and held chunks and close the current transcription file"""
+        writer_thread = self._writer_thread
+        if writer_thread is not None:
+            with self._pending_condition:
+                self._should_stop = True
+                self._pending_condition.notify()
+            writer_thread.join()
+            self._writer_thread = None
+        with self._pending_condition:
+            # written by a transcriber while the writer thread was stopping
+            chunks = list(self._pending)
+            self._pending.clear()
+            self._pending_size = 0
+        self._hold_chunks(chunks)
+        chunks = self._pop_ready_chunks(final=True)
+        with self._file_lock:
+            if self._current_file is not None or chunks:
                 try:
-                    self._current_file.write(f"\nTranscription ended at {datetime.now()}\n")
-                    self._current_file.close()
-                    self._current_file = None
+                    self._write_chunks(chunks)
+                    self._close_current_file()
                 except Exception as e:
                     logger.log(f"Error closing transcription file: {e}")
-            if self.on_finish_callback:
-                self.on_finish_callback()
+        if self.on_finish_callback:
+            self.on_finish_callback()
@@ -0,0 +1,84 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from ai_model import AiModel, result_confidence
+from file_segmenter import AudioSegment
+from logger import logger
+
+# model of the current worker process, loaded once by the pool initializer
+_worker_model: Optional[AiModel] = None
+
+
+def _init_worker(model_name: str, tmp_directory: str):
+    global _worker_model
+    _worker_model = AiModel(model_name, tmp_directory)
+    _worker_model.load()
+
+
+def _transcribe_in_worker(segment: AudioSegment) -> dict:
+    return transcribe_segment(_worker_model, segment)
+
+
+def transcribe_segment(ai_model: AiModel, segment: AudioSegment, initial_prompt: Optional[str] = None) -> dict:
+    """
+    Transcribe 1 segment of a file, timestamps of the result are relative to the beginning of the file.
+    initial_prompt is the text of the previous segment, so the decode continues it
+    """
+    result = ai_model.transcribe(segment.data, initial_prompt=initial_prompt)
+    return {
+        "index": segment.index,
+        "start": segment.start,
+        "end": segment.end,
+        "text": result["text"].strip(),
+        "confidence": result_confidence(result),
+        "segments": [
+            {
+                "start": segment.start + s["start"],
+                "end": segment.start + s["end"],
+                "text": s["text"].strip(),
+                "confidence": result_confidence(s),
+            }
+            for s in result["segments"]
+        ],
+    }
+
+
+class ParallelFileTranscriber:
+    """
+    Transcribes segments of a long file on a pool of worker processes, each with its own copy of the model.
+    Segments are taken from the iterable only when a worker is about to be free, so memory stays bounded.
+    Results are returned in the order of the segments
+    """
+
+    def __init__(self, model_name: str, tmp_directory: str, workers: int):
+        self._model_name = model_name
+        self._tmp_directory = tmp_directory
+        self._workers = workers
+
+    def transcribe(self, segments: Iterable[AudioSegment]) -> Iterator[dict]:
+        logger.log(f"ParallelFileTranscriber: starting {self._workers} workers with model '{self._model_name}'")
+        # spawn, so workers don't inherit torch state of the parent process
+        executor = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._model_name, self._tmp_directory)
+        )
+        try:
+            pending = deque()
+            for segment in segments:
+                pending.append(executor.submit(_transcribe_in_worker, segment))
+                if len(pending) >= self._workers * 2:
+                    yield self._wait_result(pending.popleft())
+            while pending:
+                yield self._wait_result(pending.popleft())
+        finally:
+            # when the caller stops early, segments which haven't started yet are dropped
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _wait_result(self, future) -> dict:
+        result = future.result()
+        logger.log(f"ParallelFileTranscriber: segment {result['index']} done")
+        return result
@@ -0,0 +1,268 @@
+import json
+import time
+from bisect import bisect_left
+from collections import deque
+from itertools import count
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, List, Optional
+
+from logger import logger
+
+# stages of a chunk between the audio callback and the output file
+stageListen = "listen"  # from the audio callback until the listener hands the chunk over
+stageQueue = "queue"  # waiting in the transcriber queue
+stageDecode = "decode"  # speech recognition
+stageWrite = "write"  # output writer
+stageTotal = "total"  # from the audio callback until the text is written
+pipelineStages = (stageListen, stageQueue, stageDecode, stageWrite, stageTotal)
+
+# seconds, upper bounds of the histogram buckets
+latencyBuckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# chunks per second are counted over this window
+throughputWindow = 60.0
+
+
+class Histogram:
+    """Fixed buckets like a Prometheus histogram, observing a value costs a binary search and no allocation"""
+
+    def __init__(self, buckets=latencyBuckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket which contains the quantile"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class _SourceMetrics:
+    def __init__(self, speaker_name: str, chunk_queue):
+        self.speaker_name = speaker_name  # only a label, several sources can have the same name
+        self.chunk_queue = chunk_queue
+        self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in pipelineStages}
+        self.chunk_times = deque()  # time.time() of transcribed chunks within the throughput window
+        self.chunks = 0
+        self.audio_seconds = 0.0
+        self.decode_seconds = 0.0
+
+
+class PipelineMetrics:
+    """
+    Per source (transcriber) stage latencies, queue depths, throughput and decode real-time factor.
+    Sources are keyed by the id from register_source(), speaker names are only labels: file jobs have no name
+    and live lines can have the same one.
+    Recording a chunk only updates counters under a short lock, snapshots are built when the stats are read
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._sources: Dict[int, _SourceMetrics] = {}
+        self._source_ids = count(1)
+        self._started_at = time.time()
+
+    def reset(self):
+        """Start counting from zero, called when a new session starts"""
+        with self._lock:
+            self._sources = {}
+            self._started_at = time.time()
+
+    def register_source(self, speaker_name: str, chunk_queue) -> int:
+        """Add a transcriber and its queue, returns the source id to record its chunks with"""
+        with self._lock:
+            source_id = next(self._source_ids)
+            self._sources[source_id] = _SourceMetrics(speaker_name, chunk_queue)
+        return source_id
+
+    def record_chunk(self, source_id: int, chunk_audio):
+        """Observe the stage latencies of a written chunk from the timestamps it collected along the pipeline"""
+        timestamps = [chunk_audio.captured_at, chunk_audio.queued_at, chunk_audio.decode_started_at,
+                      chunk_audio.decoded_at, chunk_audio.written_at]
+        with self._lock:
+            speaker = self._sources.get(source_id)
+            if speaker is None:
+                return  # registered before reset()
+            for stage, start, end in zip(pipelineStages, timestamps, timestamps[1:]):
+                if start is not None and end is not None:
+                    speaker.stages[stage].observe(max(0.0, end - start))
+            if chunk_audio.captured_at is not None and chunk_audio.written_at is not None:
+                speaker.stages[stageTotal].observe(max(0.0, chunk_audio.written_at - chunk_audio.captured_at))
+
+    def record_decode(self, source_id: int, audio_seconds: float, decode_seconds: float):
+        now = time.time()
+        with self._lock:
+            speaker = self._sources.get(source_id)
+            if speaker is None:
+                return
+            speaker.chunks += 1
+            speaker.audio_seconds += audio_seconds
+            speaker.decode_seconds += decode_seconds
+            speaker.chunk_times.append(now)
+            while speaker.chunk_times and speaker.chunk_times[0] < now - throughputWindow:
+                speaker.chunk_times.popleft()
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self._lock:
+            window = min(throughputWindow, max(now - self._started_at, 1e-3))
+            sources = {}
+            for source_id, speaker in self._sources.items():
+                recent = sum(1 for chunk_time in speaker.chunk_times if chunk_time >= now - throughputWindow)
+                chunk_queue = speaker.chunk_queue
+                sources[str(source_id)] = {
+                    "speaker": speaker.speaker_name,
+                    "chunks": speaker.chunks,
+                    "chunks_per_second": round(recent / window, 3),
+                    "audio_seconds": round(speaker.audio_seconds, 3),
+                    "decode_seconds": round(speaker.decode_seconds, 3),
+                    "rtf": round(speaker.decode_seconds / speaker.audio_seconds, 4) if speaker.audio_seconds else None,
+                    "stages": {stage: histogram.to_dict() for stage, histogram in speaker.stages.items()},
+                    "queue": {
+                        "depth": chunk_queue.qsize(),
+                        "max_depth": chunk_queue.maxsize,
+                        "dropped": chunk_queue.dropped_count,
+                        "merged": chunk_queue.merged_count,
+                    },
+                }
+        return {"timestamp": now, "uptime": round(now - self._started_at, 3), "sources": sources}
+
+    def export_json(self, file_path: str):
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        logger.log(f"PipelineMetrics: exported to {file_path}")
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines = ["# TYPE transcriber_stage_seconds histogram"]
+        with self._lock:
+            sources = [(_source_labels(source_id, speaker), speaker) for source_id, speaker in self._sources.items()]
+            for source_labels, speaker in sources:
+                for stage, histogram in speaker.stages.items():
+                    labels = f'{source_labels},stage="{stage}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'transcriber_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'transcriber_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f"transcriber_stage_seconds_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"transcriber_stage_seconds_count{{{labels}}} {histogram.count}")
+            counters = (("transcriber_chunks_total", "chunks"),
+                        ("transcriber_audio_seconds_total", "audio_seconds"),
+                        ("transcriber_decode_seconds_total", "decode_seconds"))
+            for metric, attribute in counters:
+                lines.append(f"# TYPE {metric} counter")
+                for source_labels, speaker in sources:
+                    lines.append(f"{metric}{{{source_labels}}} {getattr(speaker, attribute)}")
+            lines.append("# TYPE transcriber_queue_depth gauge")
+            for source_labels, speaker in sources:
+                lines.append(f"transcriber_queue_depth{{{source_labels}}} {speaker.chunk_queue.qsize()}")
+            lines.append("# TYPE transcriber_queue_dropped_total counter")
+            for source_labels, speaker in sources:
+                lines.append(f"transcriber_queue_dropped_total{{{source_labels}}} {speaker.chunk_queue.dropped_count}")
+        return "\n".join(lines) + "\n"
+
+    def format_summary(self) -> List[str]:
+        """1 line per source for the GUI stats panel"""
+        snapshot = self.snapshot()
+        names = [speaker["speaker"] or "file" for speaker in snapshot["sources"].values()]
+        lines = []
+        for (source_id, speaker), name in zip(snapshot["sources"].items(), names):
+            if names.count(name) > 1:
+                name = f"{name} #{source_id}"
+            queue = speaker["queue"]
+            total = speaker["stages"][stageTotal]
+            decode = speaker["stages"][stageDecode]
+            rtf = f"{speaker['rtf']:.2f}" if speaker["rtf"] is not None else "-"
+            lines.append(f"{name}: {speaker['chunks']} chunks, {speaker['chunks_per_second']:.2f}/s, "
+                         f"RTF {rtf}, decode p90 {_format_seconds(decode['p90'])}, "
+                         f"total p90 {_format_seconds(total['p90'])}, "
+                         f"queue {queue['depth']}/{queue['max_depth']}")
+        return lines
+
+
+def _source_labels(source_id: int, speaker: _SourceMetrics) -> str:
+    return f'source="{source_id}",speaker="{_escape_label(speaker.speaker_name)}"'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"<{value:g}s" if value != float("inf") else ">60s"
+
+
+class MetricsServer:
+    """Serves the metrics on localhost: /metrics in Prometheus text format and /metrics.json"""
+
+    def __init__(self, pipeline_metrics: PipelineMetrics, port: int):
+        self._metrics = pipeline_metrics
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[Thread] = None
+
+    def start(self):
+        pipeline_metrics = self._metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = pipeline_metrics.to_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(pipeline_metrics.snapshot()).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # every scrape would be printed otherwise
+
+        # only localhost, the metrics contain speaker names
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.log(f"MetricsServer: serving http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+
+metrics = PipelineMetrics()
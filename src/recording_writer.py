@@ -0,0 +1,75 @@
+import wave
+from threading import Thread, Event
+from typing import Optional
+
+import numpy as np
+
+from logger import logger
+from ring_buffer import AudioRingBuffer
+
+
+class RecordingWriter:
+    """
+    Writes recorded audio into a WAV file on its own thread.
+    The audio callback only copies blocks into a preallocated ring buffer with write(). They are converted and written
+    to disk in large sequential writes, so a slow disk never stalls the real-time audio callback
+    """
+
+    def __init__(self, file_path: str, sample_rate: int, channels: int = 1,
+                 flush_duration: float = 1.0, buffer_duration: float = 30.0):
+        self.file_path = file_path
+        self.sample_rate = sample_rate
+        self._flush_frames = int(sample_rate * flush_duration)
+        self._buffer = AudioRingBuffer(int(sample_rate * buffer_duration), channels)
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+        self._wave = None
+
+    def start(self):
+        self._wave = wave.open(self.file_path, 'wb')
+        self._wave.setnchannels(1)  # Mono
+        self._wave.setsampwidth(2)  # 2 bytes per sample (16 bits)
+        self._wave.setframerate(self.sample_rate)
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, data: np.ndarray):
+        """Called from the audio callback, must be cheap"""
+        self._buffer.write(data)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write_pending()
+        if self._buffer.overflow_frames:
+            logger.error(f"RecordingWriter: disk was too slow, {self._buffer.overflow_frames / self.sample_rate:.1f} sec"
+                         f" of audio are missing in {self.file_path}")
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._buffer.available() >= self._flush_frames:
+                self._write_pending()
+            else:
+                self._stop_event.wait(0.1)
+
+    def _write_pending(self):
+        views = self._buffer.read_views(self._buffer.available())
+        frames = sum(view.shape[0] for view in views)
+        if frames == 0:
+            return
+
+        audio = np.concatenate(views)
+        if audio.shape[1] > 1:
+            audio = audio.mean(axis=1)
+        audio_int16 = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        self._buffer.advance(frames)
+        try:
+            self._wave.writeframes(audio_int16.tobytes())
+        except Exception as e:
+            logger.error(f"RecordingWriter: can't write {self.file_path}: {e}")
@@ -0,0 +1,94 @@
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# zero crossings of the sinc on each side of a tap, more is a steeper filter and more work per sample
+resamplerZeroCrossings = 16
+# shape of the Kaiser window, higher is a better stopband and a wider transition
+resamplerKaiserBeta = 8.6
+# the cutoff is a bit below the output Nyquist frequency, so the transition band doesn't alias
+resamplerRolloff = 0.94
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """(frames, channels) or (frames,) -> 1-D float32, channels are averaged"""
+    if audio.ndim == 1:
+        return audio.astype(np.float32, copy=False)
+    if audio.shape[1] == 1:
+        return audio[:, 0].astype(np.float32, copy=False)
+    return audio.mean(axis=1, dtype=np.float32)
+
+
+class StreamingResampler:
+    """
+    Downmix and polyphase windowed-sinc resampling of a continuous stream which arrives in blocks.
+    The rates are reduced to up / down (48000 -> 16000 is 1 / 3, 44100 -> 16000 is 160 / 441) and a bank of `up`
+    Kaiser-windowed sinc filters is precomputed, 1 per fractional position of an output sample between input samples.
+    Only the output samples are computed: the outputs which use the same filter are a strided view over the input
+    multiplied with it in 1 matrix product. The tail of each block is kept, so the blocks join seamlessly
+    """
+
+    def __init__(self, input_rate: int, output_rate: int = 16000):
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        divisor = gcd(self.input_rate, self.output_rate)
+        self._up = self.output_rate // divisor
+        self._down = self.input_rate // divisor
+        # below 1 when downsampling, the filter removes what the output rate can't hold
+        cutoff = min(1.0, self._up / self._down) * resamplerRolloff
+        self._half_taps = int(np.ceil(resamplerZeroCrossings / cutoff))
+        self._taps = self._design_filters(cutoff)
+        # input kept from the previous block, starts with silence before the stream
+        self._history = np.zeros(self._half_taps - 1, dtype=np.float32)
+        self._history_start = -(self._half_taps - 1)  # stream position of the first kept sample
+        self._next_output = 0  # stream position of the next output sample
+
+    def _design_filters(self, cutoff: float) -> np.ndarray:
+        """(up, taps) filter bank, row f interpolates at f / up of an input sample after the base sample"""
+        taps_count = 2 * self._half_taps
+        fractions = np.arange(self._up)[:, np.newaxis] / self._up
+        # distance of each tap from the output sample, in input samples
+        distance = np.arange(taps_count)[np.newaxis, :] - (self._half_taps - 1) - fractions
+        window_position = np.clip(distance / self._half_taps, -1.0, 1.0)
+        window = np.i0(resamplerKaiserBeta * np.sqrt(1.0 - window_position ** 2)) / np.i0(resamplerKaiserBeta)
+        taps = cutoff * np.sinc(cutoff * distance) * window
+        # unity gain at DC for every fractional position
+        taps /= taps.sum(axis=1, keepdims=True)
+        return taps.astype(np.float32)
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """Resample the next block, (frames, channels) or (frames,) at input_rate -> 1-D float32 at output_rate"""
+        mono = to_mono(audio)
+        if self._up == self._down:
+            return mono.copy()
+
+        samples = np.concatenate((self._history, mono))
+        end = self._history_start + samples.shape[0]  # stream position after the last input sample
+        # an output sample needs half_taps input samples after its base sample
+        last_base = end - 1 - self._half_taps
+        last_output = ((last_base + 1) * self._up - 1) // self._down
+        count = last_output - self._next_output + 1
+        if count <= 0:
+            self._keep_history(samples, self._next_output)
+            return np.zeros(0, dtype=np.float32)
+
+        windows = sliding_window_view(samples, 2 * self._half_taps)
+        output = np.empty(count, dtype=np.float32)
+        first = self._next_output
+        for offset in range(min(self._up, count)):
+            position = first + offset
+            base = position * self._down // self._up
+            fraction = position * self._down % self._up
+            rows = len(range(offset, count, self._up))
+            start = base - (self._half_taps - 1) - self._history_start
+            # outputs `up` apart are `down` input samples apart and use the same filter
+            output[offset::self._up] = windows[start:start + (rows - 1) * self._down + 1:self._down] @ self._taps[fraction]
+        self._keep_history(samples, first + count)
+        return output
+
+    def _keep_history(self, samples: np.ndarray, next_output: int):
+        self._next_output = next_output
+        keep_from = next_output * self._down // self._up - (self._half_taps - 1)
+        self._history = samples[keep_from - self._history_start:].copy()
+        self._history_start = keep_from
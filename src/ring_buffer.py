@@ -0,0 +1,69 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Preallocated single-producer / single-consumer float32 ring buffer of audio frames.
+    The producer (audio callback) copies blocks in with write() without allocating memory.
+    The consumer takes zero-copy views of the readable spans with read_views() and releases them with advance().
+    Each side only moves its own counter, so no lock is needed between them.
+    """
+
+    def __init__(self, capacity: int, channels: int = 1):
+        self.capacity = capacity
+        self.channels = channels
+        self.overflow_frames = 0
+        self._buffer = np.zeros((capacity, channels), dtype=np.float32)
+        self._write_count = 0  # total frames written, only changed by the producer
+        self._read_count = 0  # total frames read, only changed by the consumer
+
+    def write(self, data: np.ndarray) -> int:
+        """Producer side. Frames which don't fit are dropped and counted in overflow_frames"""
+        frames = min(data.shape[0], self.capacity - (self._write_count - self._read_count))
+        if frames < data.shape[0]:
+            self.overflow_frames += data.shape[0] - frames
+        if frames <= 0:
+            return 0
+
+        data = data.reshape(data.shape[0], -1)
+        start = self._write_count % self.capacity
+        first = min(frames, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        if first < frames:
+            self._buffer[:frames - first] = data[first:frames]
+        # publish the frames only after they are copied
+        self._write_count += frames
+        return frames
+
+    @property
+    def frames_written(self) -> int:
+        """Position in the stream of the next frame the producer writes"""
+        return self._write_count
+
+    def available(self) -> int:
+        """Consumer side. Number of frames which can be read"""
+        return self._write_count - self._read_count
+
+    def read_views(self, max_frames: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Consumer side. Returns up to max_frames readable frames as 2 views into the buffer,
+        the second one is not empty only when the span wraps around the end.
+        The views are valid until advance() is called
+        """
+        frames = min(max_frames, self.available())
+        start = self._read_count % self.capacity
+        first = min(frames, self.capacity - start)
+        return self._buffer[start:start + first], self._buffer[:frames - first]
+
+    def advance(self, frames: int):
+        """Consumer side. Release frames returned by read_views()"""
+        self._read_count += min(frames, self.available())
+
+    def read(self, max_frames: int) -> np.ndarray:
+        """Consumer side. Copy up to max_frames frames out of the buffer"""
+        first, second = self.read_views(max_frames)
+        data = np.concatenate((first, second)) if second.shape[0] else first.copy()
+        self.advance(data.shape[0])
+        return data
@@ -0,0 +1,84 @@
+from threading import Lock
+from typing import Callable, Dict, Tuple
+
+from logger import logger
+from model import AudioDeviceWrapper
+
+# open streams by device id, shared by the listeners of the channels of the device
+_streams: Dict[int, "SharedInputStream"] = {}
+_streams_lock = Lock()
+
+
+class SharedInputStream:
+    """
+    1 input stream with all channels of a multichannel device, shared by the listeners of its channels.
+    The audio callback hands each listener a view of its own channel, without copying.
+    So a device has 1 callback thread instead of 1 per speaker and the channels stay sample aligned
+    """
+
+    def __init__(self, device_wrapper: AudioDeviceWrapper, sample_rate: int, blocksize: int):
+        self.device_wrapper = device_wrapper
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.channels = int(device_wrapper.device['max_input_channels'])
+        self._stream = None
+        # (channel, callback) pairs, the tuple is replaced as a whole, so the audio callback reads it without a lock
+        self._subscribers: Tuple[Tuple[int, Callable], ...] = ()
+
+    def _open(self):
+        import sounddevice as sd
+        self._stream = sd.InputStream(
+            device=self.device_wrapper.device_id,
+            channels=self.channels,
+            samplerate=self.sample_rate,
+            blocksize=self.blocksize,
+            callback=self._audio_callback
+        )
+        self._stream.start()
+        logger.log(f"SharedInputStream: {self.device_wrapper.get_name()} opened with {self.channels} channels")
+
+    def _close(self):
+        try:
+            self._stream.stop()
+            self._stream.close()
+        except Exception as ex:
+            logger.log(f"Error - can't stop shared audio stream: {ex}")
+        self._stream = None
+        logger.log(f"SharedInputStream: {self.device_wrapper.get_name()} closed")
+
+    def _audio_callback(self, data, frames, time_info, status):
+        for channel, callback in self._subscribers:
+            # a (frames, 1) view of 1 column, the listener copies it into its own ring buffer
+            callback(data[:, channel:channel + 1], frames, time_info, status)
+
+    def unsubscribe(self, callback: Callable):
+        """The stream is closed when its last channel listener unsubscribes"""
+        with _streams_lock:
+            self._subscribers = tuple(subscriber for subscriber in self._subscribers if subscriber[1] != callback)
+            if self._subscribers:
+                return
+            _streams.pop(self.device_wrapper.device_id, None)
+            self._close()
+
+
+def subscribe_channel(device_wrapper: AudioDeviceWrapper, channel: int, sample_rate: int, blocksize: int,
+                      callback: Callable) -> SharedInputStream:
+    """
+    callback(data, frames, time_info, status) gets the channel of the shared stream of the device,
+    the stream is opened by the first subscriber. AudioListener.start() checks that the device has the channel
+    """
+    with _streams_lock:
+        shared_stream = _streams.get(device_wrapper.device_id)
+        if shared_stream is None:
+            shared_stream = SharedInputStream(device_wrapper, sample_rate, blocksize)
+        elif shared_stream.sample_rate != sample_rate:
+            raise ValueError(f"{device_wrapper.get_name()} is already open with sample rate {shared_stream.sample_rate}")
+        shared_stream._subscribers = shared_stream._subscribers + ((channel, callback),)
+        if shared_stream._stream is None:
+            try:
+                shared_stream._open()
+            except Exception:
+                shared_stream._subscribers = ()
+                raise
+            _streams[device_wrapper.device_id] = shared_stream
+        return shared_stream
@@ -0,0 +1,83 @@
+import re
+from collections import deque
+from typing import List
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+class StablePrefixCommitter:
+    """
+    Commit policy for streaming transcription of a sliding window (local agreement).
+    A word is committed once two consecutive hypotheses of the same window agree on it.
+    After the window slides, words which the overlap audio repeats from the already committed text are skipped.
+    Unconfirmed words whose audio stays in the window are decoded again and committed only once they agree
+    """
+
+    def __init__(self, history_size: int = 30):
+        self._previous: List[str] = []
+        self._committed_count = 0
+        self._history = deque(maxlen=history_size)
+        self._deduplicate = False
+
+    def update(self, hypothesis: List[str]) -> List[str]:
+        """Takes the words of the latest window decode, returns the newly committed words"""
+        if self._deduplicate:
+            self._committed_count = max(self._committed_count, self._overlap_length(hypothesis))
+
+        agreed = 0
+        for previous_word, word in zip(self._previous, hypothesis):
+            if _normalize(previous_word) != _normalize(word):
+                break
+            agreed += 1
+        self._previous = hypothesis
+
+        if agreed <= self._committed_count:
+            return []
+        words = hypothesis[self._committed_count:agreed]
+        self._committed_count = agreed
+        return self._commit(words)
+
+    def flush(self) -> List[str]:
+        """Commit the rest of the latest hypothesis, used when the stream ends"""
+        words = self._previous[self._committed_count:]
+        self._committed_count = len(self._previous)
+        return self._commit(words)
+
+    def uncommitted_share(self) -> float:
+        """Part of the latest hypothesis which is not committed, about the part of the window audio it covers"""
+        if not self._previous:
+            return 0.0
+        return (len(self._previous) - self._committed_count) / len(self._previous)
+
+    def slide(self, kept_share: float) -> List[str]:
+        """
+        The window start moved and kept_share of its end is the start of the next window.
+        Following hypotheses start with the kept audio: its committed words are skipped by the overlap with
+        the committed text and its unconfirmed words are decoded again. Returns the unconfirmed words whose
+        audio left the window, they can't be decoded again
+        """
+        kept_from = int(round(len(self._previous) * (1.0 - kept_share)))
+        words = self._commit(self._previous[self._committed_count:kept_from])
+        self._previous = []
+        self._committed_count = 0
+        self._deduplicate = True
+        return words
+
+    def _commit(self, words: List[str]) -> List[str]:
+        if words:
+            self._deduplicate = False
+            self._history.extend(words)
+        return words
+
+    def _overlap_length(self, hypothesis: List[str]) -> int:
+        history = [_normalize(word) for word in self._history]
+        words = [_normalize(word) for word in hypothesis]
+        # the overlap audio may start in the middle of a word, so also try without the first word
+        for skip, min_length in ((0, 1), (1, 2)):
+            candidate = words[skip:]
+            for length in range(min(len(candidate), len(history)), min_length - 1, -1):
+                if candidate[:length] == history[-length:]:
+                    return skip + length
+        return 0
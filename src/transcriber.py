@@ -1,38 +1,76 @@
-from threading import Lock, Thread
-from queue import Queue, Empty
-from typing import Optional
-import speech_recognition as sr
+from threading import Lock, Thread, Event
+from queue import Empty
+from typing import Optional, Iterator, Tuple
 import numpy as np
 import io
-import os
+import time
 import wave
-import whisper
 
 from configs import TranscriberConfig
 from logger import logger
 from model import ChunkAudio, ChunkTranscribed
 from output_writer import OutputWriter
+from chunk_queue import ChunkQueue
 from constants import *
-from ai_model import AiModel
+from ai_model import AiModel, result_confidence
+from inference_scheduler import InferenceScheduler
+from streaming import StablePrefixCommitter
+from file_segmenter import SilenceSplitter, AudioSegment
+from file_decoder import FileAudioDecoder
+from file_checkpoint import FileCheckpoint, file_content_hash, transcription_key
+from transcription_cache import TranscriptionCache
+from parallel_transcriber import ParallelFileTranscriber, transcribe_segment
+from pipeline_metrics import metrics
+
+# part of the streaming window which is kept after the window slides, so words at the edge are decoded again
+streamingOverlapDuration = 1.0
+# at most this part of the streaming window is kept to decode its unconfirmed words again
+streamingMaxKeptShare = 0.5
 
 
 class Transcriber:
-    def __init__(self, output_writer: OutputWriter, config: TranscriberConfig, ai_model: AiModel):
+    def __init__(self, output_writer: OutputWriter, config: TranscriberConfig, ai_model: AiModel,
+                 scheduler: Optional[InferenceScheduler] = None):
         self.output_writer = output_writer
         self._ai_model = ai_model
+        self._scheduler = scheduler
         self.recognizer_name = config.recogniser_name
         self.tmp_directory = config.tmp_directory
         self.use_ai = config.use_ai
         self.model_name = config.model_name
+        self.file_workers = config.file_workers
+        self._cache = TranscriptionCache(config.tmp_directory, config.cache_size_mb * 1024 * 1024)
+        self._cancel_file = Event()
         self._lock = Lock()
-        self._processing_queue = Queue()
+        self._processing_queue = ChunkQueue(config.queue_size, config.overflow_policy, config.speaker_name)
+        self._metrics_id = metrics.register_source(config.speaker_name, self._processing_queue)
+        self._in_flight_lock = Lock()
+        self._in_flight = []  # chunks which are being decoded right now
+        self._capture_watermark: Optional[float] = None  # set by the listener, see set_capture_watermark()
         self._processing_thread: Optional[Thread] = None
         self._should_stop = False
-        self._recognizer = sr.Recognizer()
-        self._start_processing_thread()
+        self._recognizer = None  # created on first use, speech_recognition is only needed without AI
         self._ready = False
         self._transcription_index = config.transcription_index
         self.speaker_name = config.speaker_name
+        self.language: Optional[str] = None  # detected by InferenceScheduler from the first chunk
+        self.streaming = config.streaming
+        self._streaming_step = config.streaming_step
+        self._streaming_window = config.streaming_window
+        self._stream_window = np.zeros(0, dtype=np.float32)
+        self._stream_new_samples = 0
+        self._stream_pending_since: Optional[float] = None
+        self._stream_window_start: Optional[float] = None  # capture time of the first sample of the window
+        self._stream_window_end: Optional[float] = None
+        self._stream_committed_until: Optional[float] = None
+        self._stream_committer = StablePrefixCommitter()
+        self._stream_index = 0
+        self._source_id = self.output_writer.register_source(self.get_watermark)
+        if self._scheduler is not None:
+            # chunks are decoded by the shared scheduler together with other speakers' chunks
+            self._scheduler.register(self)
+        else:
+            self._start_processing_thread()
 
     def init(self):
         self._ready = True
@@ -42,7 +80,8 @@ class Transcriber:
         
     def _start_processing_thread(self):
         self._should_stop = False
-        self._processing_thread = Thread(target=self._process_chunks, daemon=True)
+        target = self._process_stream if self.streaming else self._process_chunks
+        self._processing_thread = Thread(target=target, daemon=True)
         self._processing_thread.start()
         logger.log("Transcriber start")
         
@@ -52,33 +91,297 @@ class Transcriber:
 
     def _process_chunk_from_queue(self):
         try:
-            chunk_audio = self._processing_queue.get(timeout=1.0)
+            chunk_audio = self._processing_queue.get(timeout=1.0, on_taken=self._mark_in_flight)
             with self._lock:
-                transcribed = self._transcribe(chunk_audio)
-                logger.log(f"Transcriber {self.speaker_name} chunk {chunk_audio.index}")
-                self.output_writer.write(ChunkTranscribed(chunk_audio.index, transcribed, self.speaker_name))
+                chunk_audio.decode_started_at = time.time()
+                transcribed, confidence = self._transcribe(chunk_audio)
+                chunk_audio.decoded_at = time.time()
+                self._log_chunk_transcribed(chunk_audio)
+                self.output_writer.write(self._to_chunk_transcribed(chunk_audio, transcribed, confidence))
+                self._record_chunk_metrics(chunk_audio)
+                self._unmark_in_flight(chunk_audio)
                 self._processing_queue.task_done()
         except Empty:
             pass # No chunks to process, continue waiting
-        
+
+    def _process_stream(self):
+        """Streaming mode: re-decode the sliding window every streaming step and commit only the stable prefix"""
+        while not self._should_stop:
+            self._read_stream_queue(timeout=self._streaming_step)
+            if self._stream_new_samples >= self._streaming_step * 16000:
+                self._decode_stream_window()
+
+    def _read_stream_queue(self, timeout: Optional[float]):
+        blocks = []
+        try:
+            # the blocks stay in flight until they are in the window, so get_watermark() always sees them
+            if timeout:
+                blocks.append(self._processing_queue.get(timeout=timeout, on_taken=self._mark_in_flight))
+            else:
+                blocks.append(self._processing_queue.get_nowait(on_taken=self._mark_in_flight))
+            while True:
+                blocks.append(self._processing_queue.get_nowait(on_taken=self._mark_in_flight))
+        except Empty:
+            pass
+        if not blocks:
+            return
+        if self._stream_pending_since is None:
+            self._stream_pending_since = blocks[0].captured_at
+        if self._stream_window.shape[0] == 0:
+            self._stream_window_start = blocks[0].capture_start
+        self._stream_window_end = blocks[-1].captured_at
+        audio = [self._to_whisper_audio(chunk_audio.data) for chunk_audio in blocks]
+        self._stream_window = np.concatenate([self._stream_window] + audio)
+        self._stream_new_samples += sum(block.shape[0] for block in audio)
+        for chunk_audio in blocks:
+            self._unmark_in_flight(chunk_audio)
+            self._processing_queue.task_done()
+
+    def _decode_stream_window(self, final: bool = False):
+        with self._lock:
+            new_audio_seconds = self._stream_new_samples / 16000
+            self._stream_new_samples = 0
+            self._stream_pending_since = None
+            decode_started_at = time.time()
+            # the confidence is of the whole window, not of the committed words, so it isn't reported
+            text, _ = self._transcribe(ChunkAudio(self._stream_index, self._stream_window))
+            hypothesis = text.split()
+            # the window is decoded again every step, so RTF is decode time per second of new audio
+            metrics.record_decode(self._metrics_id, new_audio_seconds, time.time() - decode_started_at)
+            words = self._stream_committer.update(hypothesis)
+            window_full = self._stream_window.shape[0] >= self._streaming_window * 16000
+            if final:
+                words = words + self._stream_committer.flush()
+                self._write_stream_words(words)
+            elif window_full:
+                kept = self._stream_kept_samples()
+                words = words + self._stream_committer.slide(kept / self._stream_window.shape[0])
+                self._write_stream_words(words)
+                if self._stream_window_start is not None:
+                    self._stream_window_start += (self._stream_window.shape[0] - kept) / 16000
+                self._stream_window = self._stream_window[-kept:].copy()
+            else:
+                self._write_stream_words(words)
+
+    def _stream_kept_samples(self) -> int:
+        """The overlap plus the audio of the unconfirmed words, so they are decoded again in the next window"""
+        window_samples = self._stream_window.shape[0]
+        uncommitted = int(self._stream_committer.uncommitted_share() * window_samples)
+        kept = int(streamingOverlapDuration * 16000) + uncommitted
+        return min(kept, max(int(streamingOverlapDuration * 16000), int(window_samples * streamingMaxKeptShare)))
+
+    def _write_stream_words(self, words):
+        if not words:
+            return
+        logger.debug(f"Transcriber {self.speaker_name} stream commit {self._stream_index}")
+        # word times are unknown, committed words are placed between the previous commit and the newest audio
+        start = self._stream_uncommitted_start()
+        self._stream_committed_until = self._stream_window_end
+        self.output_writer.write(ChunkTranscribed(self._stream_index, " ".join(words), self.speaker_name,
+                                                  self._session_time(start),
+                                                  self._session_time(self._stream_window_end)))
+        self._stream_index += 1
+
+    def _stream_uncommitted_start(self) -> Optional[float]:
+        if self._stream_window_start is None or self._stream_committed_until is None:
+            return self._stream_window_start
+        return max(self._stream_window_start, self._stream_committed_until)
+
+    def next_pending_chunk(self) -> Optional[ChunkAudio]:
+        """Used by InferenceScheduler to collect queued chunks"""
+        try:
+            chunk_audio = self._processing_queue.get_nowait(on_taken=self._mark_in_flight)
+        except Empty:
+            return None
+        chunk_audio.decode_started_at = time.time()
+        return chunk_audio
+
+    def to_ai_audio(self, chunk_audio: ChunkAudio) -> np.ndarray:
+        return self._to_whisper_audio(chunk_audio.data)
+
+    def complete_chunk(self, chunk_audio: ChunkAudio, transcribed: str, confidence: Optional[float] = None):
+        """Used by InferenceScheduler to hand back the decoded text of a chunk taken with next_pending_chunk()"""
+        with self._lock:
+            chunk_audio.decoded_at = time.time()
+            self._log_chunk_transcribed(chunk_audio)
+            self.output_writer.write(self._to_chunk_transcribed(chunk_audio, transcribed, confidence))
+            self._record_chunk_metrics(chunk_audio)
+            self._unmark_in_flight(chunk_audio)
+            self._processing_queue.task_done()
+
+    def _to_chunk_transcribed(self, chunk_audio: ChunkAudio, transcribed: str,
+                              confidence: Optional[float]) -> ChunkTranscribed:
+        return ChunkTranscribed(chunk_audio.index, transcribed, self.speaker_name,
+                                self._session_time(chunk_audio.capture_start),
+                                self._session_time(chunk_audio.captured_at), confidence)
+
+    def _session_time(self, captured_at: Optional[float]) -> Optional[float]:
+        if captured_at is None:
+            return None
+        return max(0.0, captured_at - self.output_writer.started_at)
+
+    def set_capture_watermark(self, captured_at: Optional[float]):
+        """
+        Used by the listener: capture time of the first sample which is not handed over as a chunk yet,
+        so it is still in the audio buffer or in an open speech segment. None when nothing is captured
+        """
+        self._capture_watermark = captured_at
+
+    def get_watermark(self) -> Optional[float]:
+        """
+        Used by OutputWriter: session time before which this speaker won't write any more text,
+        the capture start of the oldest audio which is not written yet. None when it doesn't hold other speakers back
+        """
+        # read in the order the chunks move: a chunk leaves the queue already in flight,
+        # and leaves in flight already in the stream window
+        pending = [self._processing_queue.oldest_capture_start()]
+        with self._in_flight_lock:
+            pending += [chunk_audio.capture_start for chunk_audio in self._in_flight]
+        if self._stream_window.shape[0] > 0:
+            pending.append(self._stream_uncommitted_start())
+        pending.append(self._capture_watermark)
+        pending = [captured_at for captured_at in pending if captured_at is not None]
+        if not pending:
+            return None
+        return self._session_time(min(pending))
+
+    def get_lag(self) -> float:
+        """Seconds behind real time: age of the oldest captured audio which is not transcribed yet"""
+        pending = [self._processing_queue.oldest_captured_at()]
+        with self._in_flight_lock:
+            pending += [chunk_audio.captured_at for chunk_audio in self._in_flight]
+        pending.append(self._stream_pending_since)
+        pending = [captured_at for captured_at in pending if captured_at is not None]
+        if not pending:
+            return 0.0
+        return max(0.0, time.time() - min(pending))
+
+    def _mark_in_flight(self, chunk_audio: ChunkAudio):
+        with self._in_flight_lock:
+            self._in_flight.append(chunk_audio)
+
+    def _unmark_in_flight(self, chunk_audio: ChunkAudio):
+        with self._in_flight_lock:
+            self._in_flight.remove(chunk_audio)
+
+    def _record_chunk_metrics(self, chunk_audio: ChunkAudio):
+        chunk_audio.written_at = time.time()
+        metrics.record_decode(self._metrics_id, chunk_audio.duration,
+                              chunk_audio.decoded_at - chunk_audio.decode_started_at)
+        metrics.record_chunk(self._metrics_id, chunk_audio)
+
+    def _log_chunk_transcribed(self, chunk_audio: ChunkAudio):
+        if chunk_audio.captured_at is None:
+            logger.debug(f"Transcriber {self.speaker_name} chunk {chunk_audio.index}")
+        else:
+            lag = time.time() - chunk_audio.captured_at
+            logger.debug(f"Transcriber {self.speaker_name} chunk {chunk_audio.index}, {lag:.1f} sec behind")
+
     def transcribe_chunk(self, chunk_audio: ChunkAudio, speaker_name: Optional[str] = None):
         if not self._ready:
             raise Exception(f"Transcriber {self.speaker_name} is not ready")
-        transcribed = self._transcribe(chunk_audio)
+        transcribed, confidence = self._transcribe(chunk_audio)
         if transcribed:
-            self.output_writer.write(ChunkTranscribed(chunk_audio.index, transcribed, speaker_name))
+            self.output_writer.write(ChunkTranscribed(chunk_audio.index, transcribed, speaker_name,
+                                                      confidence=confidence))
 
     def transcribe_chunk_async(self, chunk_audio: ChunkAudio):
         if not self._ready:
             raise Exception("Transcriber is not ready")
+        chunk_audio.queued_at = time.time()
         self._processing_queue.put(chunk_audio)
+        if self._scheduler is not None:
+            self._scheduler.notify()
 
     def transcribe_file(self, file_path: str):
-        transcribed = self._transcribe_file_with_ai(file_path)
-        logger.log(f"Transcriber {self.speaker_name}: file transcribe finished, now formatting the output")
-        formatted_text = self._format_sentences(transcribed)
-        logger.log(f"Transcriber {self.speaker_name}: formatting finished")
-        self.output_writer.write(ChunkTranscribed(1, formatted_text))
+        self._cancel_file.clear()
+        key = self._get_file_key(file_path)
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.log(f"Transcriber {self.speaker_name}: file was transcribed before, using the cached result")
+            for result in cached:
+                self._write_file_result(result)
+            return
+
+        checkpoint = FileCheckpoint(self.tmp_directory, key)
+        completed = checkpoint.load()
+        if completed:
+            logger.log(f"Transcriber {self.speaker_name}: resume file from {completed[-1]['end']:.0f} sec,"
+                       f" {len(completed)} segments are already transcribed")
+        for result in completed:
+            self._write_file_result(result)
+
+        start_time = completed[-1]["end"] if completed else 0.0
+        previous_text = completed[-1]["text"] if completed else None
+        for result in self._transcribe_file_rest(file_path, start_time, len(completed), previous_text):
+            checkpoint.append(result)
+            completed.append(result)
+            self._write_file_result(result)
+            # the transcript on disk is as complete as the checkpoint
+            self.output_writer.checkpoint()
+            if self._cancel_file.is_set():
+                break
+
+        if self._cancel_file.is_set():
+            logger.log(f"Transcriber {self.speaker_name}: file transcribe interrupted, start the same file again to resume")
+            return
+        self._cache.put(key, completed)
+        checkpoint.remove()
+        logger.log(f"Transcriber {self.speaker_name}: file transcribe finished")
+
+    def cancel_file(self):
+        """Interrupt transcribe_file() after the current segment. Finished segments stay in the checkpoint"""
+        self._cancel_file.set()
+
+    def _get_file_key(self, file_path: str) -> str:
+        # the segments are cut by the same splitter as in _split_file() with any number of workers,
+        # so a file stopped with 1 worker can be resumed with several
+        options = {"splitter": SilenceSplitter().options()}
+        return transcription_key(file_content_hash(file_path), self.model_name, options)
+
+    def _write_file_result(self, result: dict):
+        # each segment is written as soon as it is ready, so the first text appears within seconds
+        if self.output_writer.output_format != outputFormatTxt:
+            # subtitles and json get an entry per Whisper segment, with its own timestamps
+            for segment in result["segments"]:
+                self.output_writer.write(ChunkTranscribed(result["index"], segment["text"],
+                                                          start=segment["start"], end=segment["end"],
+                                                          confidence=segment.get("confidence")))
+        elif result["text"]:
+            self.output_writer.write(ChunkTranscribed(result["index"], self._format_sentences(result["text"]),
+                                                      start=result["start"], end=result["end"],
+                                                      confidence=result.get("confidence")))
+
+    def _split_file(self, file_path: str, start_time: float, first_index: int) -> Iterator[AudioSegment]:
+        """Decodes the file window by window and yields segments cut at pauses"""
+        splitter = SilenceSplitter(start_time=start_time, first_index=first_index)
+        for window in FileAudioDecoder(file_path, start=start_time).windows():
+            if self._cancel_file.is_set():
+                return
+            yield from splitter.feed(window)
+        last_segment = splitter.flush()
+        if last_segment is not None:
+            yield last_segment
+
+    def _transcribe_file_rest(self, file_path: str, start_time: float, first_index: int,
+                              previous_text: Optional[str]) -> Iterator[dict]:
+        """Yields results from start_time in order, timestamps are relative to the beginning of the file"""
+        segments = self._split_file(file_path, start_time, first_index)
+        if self.file_workers > 1:
+            parallel = ParallelFileTranscriber(self.model_name, self.tmp_directory, self.file_workers)
+            yield from parallel.transcribe(segments)
+            return
+        if self._ai_model is None:
+            raise Exception("Ai model is not loaded")
+        for segment in segments:
+            decode_started_at = time.time()
+            # the text of the previous segment is the prompt, like Whisper's own 30 s windows within a segment,
+            # so the context isn't lost at the cuts
+            result = transcribe_segment(self._ai_model, segment, previous_text)
+            metrics.record_decode(self._metrics_id, segment.end - segment.start, time.time() - decode_started_at)
+            previous_text = result["text"] or previous_text
+            yield result
+            logger.log(f"Transcriber {self.speaker_name}: segment {segment.index} done")
 
     def _format_sentences(self, text: str) -> str:
         """Format text so each sentence starts on a new line."""
@@ -89,28 +392,36 @@ class Transcriber:
         text = '\n'.join(line.strip() for line in text.splitlines() if line.strip())
         return text
 
-    def _transcribe(self, chunk_audio: ChunkAudio) -> str:
+    def _transcribe(self, chunk_audio: ChunkAudio) -> Tuple[str, Optional[float]]:
+        """Returns the text and its confidence, which only Whisper reports"""
         if self.use_ai:
             return self._transcribe_ai(chunk_audio)
         if self.recognizer_name == recogniserDummy:
-            return self._transcribe_dummy(chunk_audio)
+            return self._transcribe_dummy(chunk_audio), None
         elif self.recognizer_name == recogniserSphinx:
-            return self._transcribe_sphinx(chunk_audio)
+            return self._transcribe_sphinx(chunk_audio), None
         elif self.recognizer_name == recogniserGoogleCloud:
-            return self._transcribe_google_cloud(chunk_audio)
+            return self._transcribe_google_cloud(chunk_audio), None
         else:
             raise Exception(f"recogniser {self.recognizer_name} is not supported")
 
     def _transcribe_dummy(self, chunk_audio: ChunkAudio) -> str:
         return f"chunk: {chunk_audio.index}, size: {chunk_audio.data.nbytes} bytes"
 
+    def _get_recognizer(self):
+        if self._recognizer is None:
+            import speech_recognition as sr
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
+
     def _transcribe_sphinx(self, chunk_audio: ChunkAudio) -> str:
+        import speech_recognition as sr
         try:
             wav_bytes = self._numpy_to_wav(chunk_audio.data)
             audio_data = sr.AudioData(wav_bytes, sample_rate=16000, sample_width=2)
 
             try:
-                text = self._recognizer.recognize_sphinx(audio_data)
+                text = self._get_recognizer().recognize_sphinx(audio_data)
                 return text
             except sr.UnknownValueError:
                 return ""  # No speech detected
@@ -123,12 +434,13 @@ class Transcriber:
             return ""
 
     def _transcribe_google_cloud(self, chunk_audio: ChunkAudio) -> str:
+        import speech_recognition as sr
         try:
             wav_bytes = self._numpy_to_wav(chunk_audio.data)
             audio_data = sr.AudioData(wav_bytes, sample_rate=16000, sample_width=2)
 
             try:
-                text = self._recognizer.recognize_google(audio_data)
+                text = self._get_recognizer().recognize_google(audio_data)
                 return text
             except sr.UnknownValueError:
                 return ""  # No speech detected
@@ -140,29 +452,29 @@ class Transcriber:
             logger.log(f"Error processing audio chunk: {e}")
             return ""
 
-    def _transcribe_ai(self, chunk_audio: ChunkAudio) -> str:
+    def _transcribe_ai(self, chunk_audio: ChunkAudio) -> Tuple[str, Optional[float]]:
         try:
-            wav_bytes = self._numpy_to_wav(chunk_audio.data)
-            
-            # Save to a temporary file since Whisper works with files
-            temp_file = f"temp_chunk_{self.speaker_name}.wav"
-            with open(temp_file, "wb") as f:
-                f.write(wav_bytes)
-
-            result = self._transcribe_file_with_ai(temp_file)
-            os.remove(temp_file)
-            return result
+            # Whisper accepts a float32 array directly, no need for a temporary WAV file and ffmpeg decode
+            audio = self._to_whisper_audio(chunk_audio.data)
+            return self._transcribe_with_ai(audio)
 
         except Exception as e:
             logger.log(f"Error in Whisper transcription: {e}")
-            return ""
+            return "", None
 
-    def _transcribe_file_with_ai(self, file_path: str) -> str:
+    def _transcribe_with_ai(self, audio) -> Tuple[str, Optional[float]]:
         if self._ai_model is None:
             raise Exception("Ai model is not loaded")
 
-        result = self._ai_model.transcribe(file_path)
-        return result["text"].strip()
+        result = self._ai_model.transcribe(audio)
+        return result["text"].strip(), result_confidence(result)
+
+    def _to_whisper_audio(self, audio_chunk: np.ndarray) -> np.ndarray:
+        """Convert captured audio to the 1-D float32 array expected by Whisper."""
+        if audio_chunk.ndim > 1:
+            # (frames, channels) -> mono
+            audio_chunk = audio_chunk.mean(axis=1) if audio_chunk.shape[1] > 1 else audio_chunk[:, 0]
+        return np.ascontiguousarray(audio_chunk, dtype=np.float32)
 
     def _numpy_to_wav(self, audio_chunk: np.ndarray) -> bytes:
         """Convert numpy array to WAV format bytes."""
@@ -186,7 +498,20 @@ class Transcriber:
     def stop(self):
         logger.log(f"Transcriber {self.speaker_name}:  stop")
         self._should_stop = True
-        while not self._processing_queue.empty():
-            self._process_chunk_from_queue()
-            logger.log(f"Transcriber {self.speaker_name}: process remaining chunks {self._processing_queue.qsize()}")
-        self.output_writer.stop()
+        if self._scheduler is not None:
+            logger.log(f"Transcriber {self.speaker_name}: wait for remaining chunks {self._processing_queue.qsize()}")
+            self._scheduler.notify()
+            self._processing_queue.join()
+            self._scheduler.unregister(self)
+        elif self.streaming:
+            if self._processing_thread is not None:
+                self._processing_thread.join()
+            self._read_stream_queue(timeout=None)
+            if self._stream_window.shape[0] > 0:
+                self._decode_stream_window(final=True)
+        else:
+            while not self._processing_queue.empty():
+                self._process_chunk_from_queue()
+                logger.debug(f"Transcriber {self.speaker_name}: process remaining chunks {self._processing_queue.qsize()}")
+        # other speakers may still be writing, the file is closed when the last one stops
+        self.output_writer.stop_source(self._source_id)
@@ -0,0 +1,63 @@
+import json
+import os
+from typing import List, Optional
+
+from logger import logger
+
+
+class TranscriptionCache:
+    """
+    Persistent cache of file transcription results in <tmp_directory>/cache, one JSON file per transcription key.
+    Reading an entry marks it as recently used. When the cache grows over max_size_bytes,
+    the least recently used entries are evicted
+    """
+
+    def __init__(self, tmp_directory: str, max_size_bytes: int):
+        self._directory = os.path.join(tmp_directory, "cache")
+        self._max_size_bytes = max_size_bytes
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        file_path = self._get_path(key)
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                results = json.load(f)
+            os.utime(file_path)  # mark as recently used
+            return results
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"TranscriptionCache: can't read {file_path}: {e}")
+            return None
+
+    def put(self, key: str, results: List[dict]):
+        os.makedirs(self._directory, exist_ok=True)
+        file_path = self._get_path(key)
+        tmp_path = file_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(results, f)
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            logger.error(f"TranscriptionCache: can't write {file_path}: {e}")
+            return
+        self._evict()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self._directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self._directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self._max_size_bytes:
+                break
+            try:
+                os.remove(os.path.join(self._directory, name))
+                total_size -= size
+                logger.log(f"TranscriptionCache: evicted {name}")
+            except Exception as e:
+                logger.error(f"TranscriptionCache: can't evict {name}: {e}")
@@ -0,0 +1,154 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    Energy based voice activity detector for a continuous stream of mono float32 samples.
+    Frame energies are computed for a whole block at once, the noise floor adapts to the input level.
+    A segment is closed at a natural pause or when it reaches the max duration. Silence is never emitted.
+    Segments are returned with the position of their first sample in the stream
+    """
+
+    def __init__(self, sample_rate: int, max_segment_duration: float,
+                 frame_duration: float = 0.03,
+                 min_silence_duration: float = 0.5,
+                 min_speech_duration: float = 0.25,
+                 padding_duration: float = 0.2,
+                 threshold_ratio: float = 3.0,
+                 min_threshold: float = 0.005):
+        self._frame_length = max(1, int(sample_rate * frame_duration))
+        self._max_segment_frames = max(1, int(max_segment_duration / frame_duration))
+        self._min_silence_frames = max(1, int(min_silence_duration / frame_duration))
+        self._min_speech_frames = max(1, int(min_speech_duration / frame_duration))
+        self._padding_frames = int(padding_duration / frame_duration)
+        self._threshold_ratio = threshold_ratio
+        self._min_threshold = min_threshold
+        self._noise_level = min_threshold
+
+        # samples which don't fill a whole frame yet
+        self._remainder = np.zeros(0, dtype=np.float32)
+
+        # preallocated buffer of the open segment: leading padding + max segment length
+        self._segment = np.zeros((self._padding_frames + self._max_segment_frames) * self._frame_length, dtype=np.float32)
+        self._segment_frames = 0
+        self._segment_start_frame = 0
+        self._frames_seen = 0  # frames processed since the start of the stream
+        self._in_speech = False
+        self._speech_frames = 0
+        self._silence_frames = 0
+
+        # last silent frames, they are prepended to a segment so the first word isn't cut
+        self._preroll = np.zeros((self._padding_frames, self._frame_length), dtype=np.float32)
+        self._preroll_position = 0
+        self._preroll_count = 0
+
+    def process(self, samples: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """Feed the next block of samples. Returns (start sample, audio) of speech segments completed within this block"""
+        if self._remainder.size:
+            samples = np.concatenate((self._remainder, samples))
+        frames_count = samples.shape[0] // self._frame_length
+        self._remainder = samples[frames_count * self._frame_length:].astype(np.float32, copy=True)
+        if frames_count == 0:
+            return []
+
+        frames = samples[:frames_count * self._frame_length].reshape(frames_count, self._frame_length)
+        rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / self._frame_length)
+        is_speech = rms > self._update_threshold(rms)
+        first_frame = self._frames_seen
+        self._frames_seen += frames_count
+
+        segments = []
+        if not self._in_speech and not is_speech.any():
+            # fast path for silence, only remember the tail for the next segment padding
+            self._push_preroll(frames[-self._padding_frames:])
+            return segments
+
+        for frame_index, (frame, speech) in enumerate(zip(frames, is_speech), start=first_frame):
+            if not self._in_speech:
+                if speech:
+                    self._open_segment(frame_index)
+                    self._append_frame(frame)
+                    self._speech_frames = 1
+                else:
+                    self._push_preroll(frame[np.newaxis, :])
+                continue
+
+            self._append_frame(frame)
+            if speech:
+                self._speech_frames += 1
+                self._silence_frames = 0
+            else:
+                self._silence_frames += 1
+
+            if self._silence_frames >= self._min_silence_frames or self._segment_frames >= self._segment_capacity():
+                segment = self._close_segment()
+                if segment is not None:
+                    segments.append(segment)
+        return segments
+
+    def open_segment_start(self) -> Optional[int]:
+        """Position of the first sample of the segment which is not closed yet, None during silence"""
+        if not self._in_speech:
+            return None
+        return self._segment_start_frame * self._frame_length
+
+    def flush(self) -> Optional[Tuple[int, np.ndarray]]:
+        """Close the open segment, if any. Call it when the stream ends"""
+        self._remainder = np.zeros(0, dtype=np.float32)
+        if not self._in_speech:
+            return None
+        return self._close_segment()
+
+    def _update_threshold(self, rms: np.ndarray) -> float:
+        threshold = max(self._min_threshold, self._noise_level * self._threshold_ratio)
+        # the noise floor follows quiet frames, drops immediately and rises only very slowly during long speech
+        quiet = rms[rms <= threshold]
+        if quiet.size:
+            self._noise_level += (float(quiet.mean()) - self._noise_level) * 0.05
+        else:
+            self._noise_level += (float(rms.min()) - self._noise_level) * 0.002
+        self._noise_level = min(self._noise_level, max(float(rms.min()), self._min_threshold / self._threshold_ratio))
+        return max(self._min_threshold, self._noise_level * self._threshold_ratio)
+
+    def _segment_capacity(self) -> int:
+        return self._segment.shape[0] // self._frame_length
+
+    def _push_preroll(self, frames: np.ndarray):
+        if not self._padding_frames:
+            return  # no padding, segments start at the first speech frame
+        for frame in frames:
+            self._preroll[self._preroll_position] = frame
+            self._preroll_position = (self._preroll_position + 1) % self._padding_frames
+            self._preroll_count = min(self._preroll_count + 1, self._padding_frames)
+
+    def _open_segment(self, frame_index: int):
+        self._in_speech = True
+        self._segment_frames = 0
+        self._silence_frames = 0
+        self._segment_start_frame = frame_index - self._preroll_count
+        start = self._preroll_position - self._preroll_count
+        for i in range(start, self._preroll_position):
+            self._append_frame(self._preroll[i % self._padding_frames])
+        self._preroll_count = 0
+
+    def _append_frame(self, frame: np.ndarray):
+        start = self._segment_frames * self._frame_length
+        self._segment[start:start + self._frame_length] = frame
+        self._segment_frames += 1
+
+    def _close_segment(self) -> Optional[Tuple[int, np.ndarray]]:
+        # keep only the padding of the trailing silence
+        trailing_silence = self._silence_frames - min(self._silence_frames, self._padding_frames)
+        frames_count = self._segment_frames - trailing_silence
+        speech_frames = self._speech_frames
+
+        self._in_speech = False
+        self._segment_frames = 0
+        self._speech_frames = 0
+        self._silence_frames = 0
+
+        if speech_frames < self._min_speech_frames:
+            return None
+        return self._segment_start_frame * self._frame_length, self._segment[:frames_count * self._frame_length].copy()
@@ -0,0 +1,87 @@
+import time
+from threading import Thread
+
+import numpy as np
+import pytest
+
+from chunk_queue import ChunkQueue
+from constants import overflowBlock, overflowMerge, overflowDropOldest
+from model import ChunkAudio
+
+
+def _chunk(index: int, seconds: float = 1.0) -> ChunkAudio:
+    return ChunkAudio(index, np.full(int(seconds * 16000), index, dtype=np.float32),
+                      captured_at=100.0 + index, capture_start=99.0 + index)
+
+
+def test_block_waits_for_a_free_slot():
+    queue = ChunkQueue(1, overflowBlock, "test")
+    queue.put(_chunk(0))
+    thread = Thread(target=queue.put, args=(_chunk(1),))
+    thread.start()
+    time.sleep(0.1)
+    assert thread.is_alive()
+    assert queue.qsize() == 1
+
+    assert queue.get().index == 0
+    thread.join(1.0)
+    assert not thread.is_alive()
+    assert queue.get(timeout=1.0).index == 1
+
+
+def test_merge_appends_to_the_newest_chunk():
+    queue = ChunkQueue(2, overflowMerge, "test")
+    for index in range(4):
+        queue.put(_chunk(index))
+
+    assert queue.qsize() == 2
+    assert queue.merged_count == 2
+    assert queue.get().index == 0
+    merged = queue.get()
+    assert merged.index == 1
+    np.testing.assert_array_equal(merged.data, np.concatenate([_chunk(i).data for i in (1, 2, 3)]))
+    # the merged chunk spans from the capture start of the first part to the capture end of the last one
+    assert merged.capture_start == _chunk(1).capture_start
+    assert merged.captured_at == _chunk(3).captured_at
+
+
+def test_merge_drops_the_oldest_above_max_merged_duration():
+    queue = ChunkQueue(1, overflowMerge, "test", max_merged_duration=1.5)
+    queue.put(_chunk(0))
+    queue.put(_chunk(1))
+
+    assert queue.merged_count == 0
+    assert queue.dropped_count == 1
+    assert queue.get().index == 1
+
+
+def test_drop_oldest_keeps_the_newest_chunks():
+    queue = ChunkQueue(2, overflowDropOldest, "test")
+    for index in range(5):
+        queue.put(_chunk(index))
+
+    assert queue.dropped_count == 3
+    assert [queue.get().index, queue.get().index] == [3, 4]
+    # dropped chunks count as done, so join() only waits for the chunks which were taken
+    queue.task_done()
+    queue.task_done()
+    queue.join()
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ChunkQueue(1, "spill", "test")
+
+
+def test_on_taken_runs_before_the_queue_is_unlocked():
+    queue = ChunkQueue(2, overflowBlock, "test")
+    queue.put(_chunk(0))
+    seen = []
+
+    def on_taken(chunk_audio: ChunkAudio):
+        # a reader of the queue would wait here, so the chunk is never missing from both places
+        seen.append((chunk_audio.index, queue._mutex.locked()))
+
+    assert queue.get_nowait(on_taken=on_taken).index == 0
+    assert seen == [(0, True)]
+    assert queue.oldest_capture_start() is None
@@ -0,0 +1,67 @@
+import os
+
+from file_checkpoint import FileCheckpoint, file_content_hash, transcription_key
+from file_segmenter import SilenceSplitter
+
+
+def _result(index: int) -> dict:
+    return {"index": index, "start": index * 60.0, "end": (index + 1) * 60.0, "text": f"segment {index}"}
+
+
+def test_key_depends_on_content_model_and_options(tmp_path):
+    first = tmp_path / "a.wav"
+    first.write_bytes(b"audio")
+    # a renamed copy has the same content
+    copy = tmp_path / "b.wav"
+    copy.write_bytes(b"audio")
+    other = tmp_path / "c.wav"
+    other.write_bytes(b"other audio")
+    options = {"sample_rate": 16000, "segment_duration": 60.0}
+    key = transcription_key(file_content_hash(str(first)), "base", options)
+
+    assert transcription_key(file_content_hash(str(copy)), "base", dict(options)) == key
+    assert transcription_key(file_content_hash(str(other)), "base", options) != key
+    assert transcription_key(file_content_hash(str(first)), "small", options) != key
+    assert transcription_key(file_content_hash(str(first)), "base", {**options, "segment_duration": 30.0}) != key
+
+
+def test_key_doesnt_depend_on_options_order():
+    assert (transcription_key("hash", "base", {"a": 1, "b": 2})
+            == transcription_key("hash", "base", {"b": 2, "a": 1}))
+
+
+def test_resume_from_the_completed_segments(tmp_path):
+    checkpoint = FileCheckpoint(str(tmp_path), "key")
+    assert checkpoint.load() == []
+    for index in range(3):
+        checkpoint.append(_result(index))
+
+    assert FileCheckpoint(str(tmp_path), "key").load() == [_result(0), _result(1), _result(2)]
+    assert FileCheckpoint(str(tmp_path), "other key").load() == []
+
+
+def test_partly_written_last_line_is_ignored(tmp_path):
+    checkpoint = FileCheckpoint(str(tmp_path), "key")
+    checkpoint.append(_result(0))
+    checkpoint.append(_result(1))
+    with open(checkpoint.file_path, "a", encoding="utf-8") as f:
+        f.write('{"index": 2, "start": 12')
+
+    assert checkpoint.load() == [_result(0), _result(1)]
+
+
+def test_remove_deletes_the_checkpoint(tmp_path):
+    checkpoint = FileCheckpoint(str(tmp_path), "key")
+    checkpoint.append(_result(0))
+    checkpoint.remove()
+    assert not os.path.exists(checkpoint.file_path)
+    assert checkpoint.load() == []
+
+
+def test_splitter_options_change_the_key():
+    default = transcription_key("hash", "base", {"splitter": SilenceSplitter().options()})
+    shorter = transcription_key("hash", "base", {"splitter": SilenceSplitter(target_duration=30.0).options()})
+    assert default != shorter
+    # the position to resume from isn't a part of the key
+    resumed = SilenceSplitter(start_time=120.0, first_index=2).options()
+    assert transcription_key("hash", "base", {"splitter": resumed}) == default
@@ -0,0 +1,23 @@
+import threading
+import time
+
+from logger import Logger
+
+
+def test_records_held_by_the_drain_thread_stay_in_order():
+    logger = Logger()
+    logger.log("first")
+    time.sleep(0.1)
+    logger.drain_externally()
+    # the drain thread takes this record, finds the external drain and hands the record back
+    logger.log("second")
+    time.sleep(0.1)
+    logger.log("third")
+
+    batches = []
+    logger.set_log_func(lambda lines: batches.append((threading.current_thread(), lines)))
+    assert logger.drain() == 2
+    assert len(batches) == 1
+    thread, lines = batches[0]
+    assert thread is threading.current_thread()
+    assert [line.split(": ", 1)[1] for line in lines] == ["second", "third"]
@@ -0,0 +1,70 @@
+import tkinter as tk
+
+import pytest
+
+import main
+from logger import logger
+
+
+class _StubRoot:
+    """Only what TranscriberApp calls on the root window, there is no display for a real Tk"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def title(self, title):
+        pass
+
+    def geometry(self, geometry):
+        pass
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def after_idle(self, callback):
+        self.scheduled.append(callback)
+
+
+class _StubLogView:
+    def __init__(self):
+        self.lines = []
+
+    def append(self, lines):
+        self.lines.extend(lines)
+
+
+@pytest.fixture
+def tcl_root(monkeypatch):
+    # tk variables need an interpreter, a Tcl one works without a display
+    interpreter = tk.Tcl()
+    monkeypatch.setattr(tk, "_default_root", interpreter)
+    yield interpreter
+    logger.set_log_func(None)
+    logger.set_show_error_func(None)
+    logger._external_drain = False
+
+
+@pytest.fixture
+def app(tcl_root, monkeypatch) -> main.TranscriberApp:
+    # like the real render, the log view only exists after render_all()
+    def render_all(gui):
+        gui.logs_props.log_view = _StubLogView()
+    monkeypatch.setattr(main.GuiRenderer, "render_all", render_all)
+    monkeypatch.setattr(logger, "set_log_file", lambda file_path: None)
+    return main.TranscriberApp(_StubRoot())
+
+
+def test_app_starts_and_shows_the_log_lines(app):
+    logger.log("hello")
+    logger.drain()
+
+    assert any(line.endswith(": hello") for line in app.logs_props.log_view.lines)
+
+
+def test_bad_workers_value_is_reset_to_the_default(app):
+    app.file_listen_props.workers.set("two")
+    assert app._get_file_workers() == 1
+    assert app.file_listen_props.workers.get() == "1"
+
+    app.file_listen_props.workers.set("3")
+    assert app._get_file_workers() == 3
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+from configs import OutputConfig
+from constants import outputFormatJson, outputFormatTxt
+from model import ChunkTranscribed
+from output_writer import OutputWriter
+
+
+def _writer(tmp_path, output_format: str = outputFormatTxt, max_reorder_delay: float = 10.0) -> OutputWriter:
+    config = OutputConfig(str(tmp_path), output_format, file_name="out", flush_interval=0.05,
+                          max_reorder_delay=max_reorder_delay)
+    return OutputWriter(config, None)
+
+
+def _written_lines(tmp_path):
+    path = os.path.join(tmp_path, "out.txt")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if ": " in line]
+
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_lines_of_two_sources_are_written_in_start_order(tmp_path):
+    writer = _writer(tmp_path)
+    watermarks = {"a": 0.0, "b": 0.0}
+    source_a = writer.register_source(lambda: watermarks["a"])
+    source_b = writer.register_source(lambda: watermarks["b"])
+
+    writer.write(ChunkTranscribed(0, "b five", "b", start=5.0, end=6.0))
+    writer.write(ChunkTranscribed(0, "a one", "a", start=1.0, end=2.0))
+    writer.write(ChunkTranscribed(1, "b three", "b", start=3.0, end=4.0))
+    writer.write(ChunkTranscribed(1, "a seven", "a", start=7.0, end=8.0))
+    time.sleep(0.3)
+    assert _written_lines(tmp_path) == []
+
+    # nothing can come before 4 anymore, the lines which start later are still held
+    watermarks["a"] = 4.0
+    watermarks["b"] = 4.5
+    assert _wait_for(lambda: len(_written_lines(tmp_path)) == 2)
+    time.sleep(0.2)
+    assert _written_lines(tmp_path) == ["a: a one", "b: b three"]
+
+    writer.stop_source(source_a)
+    writer.stop_source(source_b)
+    assert _written_lines(tmp_path) == ["a: a one", "b: b three", "b: b five", "a: a seven"]
+
+
+def test_held_lines_are_released_after_max_reorder_delay(tmp_path):
+    writer = _writer(tmp_path, max_reorder_delay=0.4)
+    writer.register_source(lambda: 10.0)
+    # a source which never moves its watermark, e.g. a speaker whose decoding is stuck
+    stuck = writer.register_source(lambda: 0.0)
+
+    written_at = time.monotonic()
+    writer.write(ChunkTranscribed(0, "a later", "a", start=20.0, end=21.0))
+    writer.write(ChunkTranscribed(1, "a first", "a", start=2.0, end=3.0))
+    time.sleep(0.2)
+    assert _written_lines(tmp_path) == []
+
+    assert _wait_for(lambda: len(_written_lines(tmp_path)) == 2)
+    assert time.monotonic() - written_at >= 0.4
+    assert _written_lines(tmp_path) == ["a: a first", "a: a later"]
+    writer.stop_source(stuck)
+
+
+def test_stop_writes_the_held_lines(tmp_path):
+    writer = _writer(tmp_path, output_format=outputFormatJson)
+    source = writer.register_source(lambda: 0.0)
+    writer.write(ChunkTranscribed(0, "second", "a", start=2.0, end=3.0))
+    writer.write(ChunkTranscribed(1, "first", "b", start=1.0, end=2.0))
+    writer.stop_source(source)
+
+    with open(os.path.join(tmp_path, "out.json"), encoding="utf-8") as file:
+        assert [entry["text"] for entry in json.load(file)] == ["first", "second"]
@@ -0,0 +1,27 @@
+from chunk_queue import ChunkQueue
+from constants import overflowBlock
+from pipeline_metrics import PipelineMetrics
+
+
+def test_sources_with_the_same_speaker_name_are_kept_apart():
+    metrics = PipelineMetrics()
+    first = metrics.register_source("", ChunkQueue(4, overflowBlock, ""))
+    second = metrics.register_source("", ChunkQueue(8, overflowBlock, ""))
+    metrics.record_decode(first, 2.0, 1.0)
+    metrics.record_decode(second, 4.0, 1.0)
+    metrics.record_decode(second, 4.0, 1.0)
+
+    sources = metrics.snapshot()["sources"]
+    assert [(source["speaker"], source["chunks"], source["queue"]["max_depth"]) for source in sources.values()] == \
+        [("", 1, 4), ("", 2, 8)]
+    assert metrics.format_summary()[0].startswith(f"file #{first}: 1 chunks")
+    assert metrics.format_summary()[1].startswith(f"file #{second}: 2 chunks")
+    assert f'transcriber_chunks_total{{source="{second}",speaker=""}} 2' in metrics.to_prometheus()
+
+
+def test_reset_forgets_the_sources():
+    metrics = PipelineMetrics()
+    source = metrics.register_source("alice", ChunkQueue(4, overflowBlock, "alice"))
+    metrics.reset()
+    metrics.record_decode(source, 1.0, 1.0)
+    assert metrics.snapshot()["sources"] == {}
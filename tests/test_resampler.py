@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from resampler import StreamingResampler, to_mono
+
+
+def _tone(rate: int, seconds: float, frequency: float = 440.0) -> np.ndarray:
+    return np.sin(2 * np.pi * frequency * np.arange(int(rate * seconds)) / rate).astype(np.float32)
+
+
+def _resample(resampler: StreamingResampler, audio: np.ndarray, block_size: int) -> np.ndarray:
+    blocks = [resampler.process(audio[start:start + block_size]) for start in range(0, audio.shape[0], block_size)]
+    return np.concatenate(blocks)
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000])
+def test_output_doesnt_depend_on_block_size(input_rate):
+    audio = _tone(input_rate, 1.0) * 0.5
+    expected = _resample(StreamingResampler(input_rate), audio, audio.shape[0])
+
+    for block_size in (1, 37, 441, 480, 1024, 4410):
+        output = _resample(StreamingResampler(input_rate), audio, block_size)
+        np.testing.assert_allclose(output, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000])
+def test_tone_error(input_rate):
+    output = _resample(StreamingResampler(input_rate), _tone(input_rate, 1.0), 1024)
+    expected = _tone(16000, 1.0)[:output.shape[0]]
+
+    # output samples are at the same stream times, the last ones wait for the input after them
+    assert output.shape[0] >= 16000 - 64
+    settled = slice(64, output.shape[0])  # the first ones see the silence before the stream
+    assert np.abs(output[settled] - expected[settled]).max() < 1e-3
+
+
+def test_frequencies_above_the_output_nyquist_are_removed():
+    output = _resample(StreamingResampler(48000), _tone(48000, 1.0, frequency=12000.0), 1024)
+    assert np.abs(output[64:-64]).max() < 1e-2
+
+
+def test_same_rate_only_downmixes():
+    stereo = np.stack((_tone(16000, 0.1), np.zeros(1600, dtype=np.float32)), axis=1)
+    output = StreamingResampler(16000).process(stereo)
+    np.testing.assert_allclose(output, to_mono(stereo))
+    np.testing.assert_allclose(output, _tone(16000, 0.1) / 2, atol=1e-7)
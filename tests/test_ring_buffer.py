@@ -0,0 +1,55 @@
+import numpy as np
+
+from ring_buffer import AudioRingBuffer
+
+
+def _frames(start: int, count: int) -> np.ndarray:
+    return np.arange(start, start + count, dtype=np.float32).reshape(count, 1)
+
+
+def test_read_views_wrap_around_the_end():
+    buffer = AudioRingBuffer(8)
+    buffer.write(_frames(0, 6))
+    np.testing.assert_array_equal(buffer.read(4), _frames(0, 4))
+
+    assert buffer.write(_frames(6, 5)) == 5
+    first, second = buffer.read_views(6)
+    # frames 4..7 are at the end of the buffer and 8..10 at its start
+    np.testing.assert_array_equal(first, _frames(4, 4))
+    np.testing.assert_array_equal(second, _frames(8, 2))
+    buffer.advance(first.shape[0] + second.shape[0])
+
+    np.testing.assert_array_equal(buffer.read(8), _frames(10, 1))
+    assert buffer.available() == 0
+    assert buffer.frames_written == 11
+
+
+def test_write_drops_and_counts_the_overflow():
+    buffer = AudioRingBuffer(8)
+    assert buffer.write(_frames(0, 5)) == 5
+    assert buffer.write(_frames(5, 5)) == 3
+    assert buffer.overflow_frames == 2
+    assert buffer.write(_frames(10, 1)) == 0
+    assert buffer.overflow_frames == 3
+
+    # the oldest frames are kept, the frames which didn't fit are lost
+    np.testing.assert_array_equal(buffer.read(8), _frames(0, 8))
+    assert buffer.frames_written == 8
+
+
+def test_advance_never_passes_the_writer():
+    buffer = AudioRingBuffer(4)
+    buffer.write(_frames(0, 2))
+    buffer.advance(10)
+    assert buffer.available() == 0
+    assert buffer.write(_frames(2, 4)) == 4
+    np.testing.assert_array_equal(buffer.read(4), _frames(2, 4))
+
+
+def test_multichannel_frames_keep_their_channels():
+    buffer = AudioRingBuffer(4, channels=2)
+    data = np.arange(12, dtype=np.float32).reshape(6, 2)
+    buffer.write(data[:3])
+    buffer.read(2)
+    buffer.write(data[3:])
+    np.testing.assert_array_equal(buffer.read(4), data[2:])
@@ -0,0 +1,50 @@
+from streaming import StablePrefixCommitter
+
+
+def test_words_are_committed_once_two_hypotheses_agree():
+    committer = StablePrefixCommitter()
+    assert committer.update(["hello", "world"]) == []
+    assert committer.update(["hello", "world", "how"]) == ["hello", "world"]
+    # case and punctuation don't count as disagreement
+    assert committer.update(["Hello,", "world", "how", "are"]) == ["how"]
+    assert committer.update(["hello", "word", "how", "are"]) == []
+
+
+def test_slide_returns_the_unconfirmed_words_which_left_the_window():
+    committer = StablePrefixCommitter()
+    committer.update(["a", "b", "c", "d"])
+    assert committer.update(["a", "b", "x", "y"]) == ["a", "b"]
+    # the last quarter of the audio stays: "y" is decoded again, "x" can't be
+    assert committer.slide(0.25) == ["x"]
+
+
+def test_overlap_after_slide_is_not_committed_again():
+    committer = StablePrefixCommitter()
+    committer.update(["the", "quick", "brown", "fox"])
+    assert committer.update(["the", "quick", "brown", "fox", "jumps"]) == ["the", "quick", "brown", "fox"]
+    assert committer.slide(0.4) == []
+
+    # the kept audio repeats "brown fox" which is already committed
+    assert committer.update(["brown", "fox", "jumps", "over"]) == []
+    assert committer.update(["brown", "fox", "jumps", "over", "the"]) == ["jumps", "over"]
+
+
+def test_overlap_starting_in_the_middle_of_a_word_is_not_committed_again():
+    committer = StablePrefixCommitter()
+    committer.update(["the", "quick", "brown", "fox"])
+    committer.update(["the", "quick", "brown", "fox", "jumps"])
+    committer.slide(0.4)
+
+    # "k" is the cut end of "quick"
+    assert committer.update(["k", "brown", "fox", "jumps", "over"]) == []
+    assert committer.update(["k", "brown", "fox", "jumps", "over", "the"]) == ["jumps", "over"]
+
+
+def test_flush_commits_the_rest_of_the_latest_hypothesis():
+    committer = StablePrefixCommitter()
+    committer.update(["a", "b", "c"])
+    assert committer.update(["a", "b", "d"]) == ["a", "b"]
+    assert committer.uncommitted_share() == 1 / 3
+    assert committer.flush() == ["d"]
+    assert committer.uncommitted_share() == 0.0
+    assert committer.flush() == []
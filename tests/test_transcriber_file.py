@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import transcriber
+from configs import TranscriberConfig
+from file_checkpoint import FileCheckpoint
+
+fileDuration = 300  # seconds, 5 segments of about 60 s
+
+
+class _FakeDecoder:
+    def __init__(self, file_path: str, start: float = 0.0):
+        self.start = start
+
+    def windows(self):
+        rng = np.random.default_rng(int(self.start))
+        for _ in range(int((fileDuration - self.start) // 10)):
+            yield rng.uniform(-0.1, 0.1, 160000).astype(np.float32)
+
+
+class _FakeModel:
+    def __init__(self, on_transcribe=None):
+        self.prompts = []
+        self._on_transcribe = on_transcribe
+
+    def transcribe(self, data, language=None, initial_prompt=None):
+        self.prompts.append(initial_prompt)
+        text = f" segment {len(self.prompts)}"
+        if self._on_transcribe is not None:
+            self._on_transcribe(len(self.prompts))
+        return {"text": text, "segments": [{"start": 0.0, "end": 1.0, "text": text, "avg_logprob": -0.2}]}
+
+
+class _CollectingWriter:
+    output_format = "txt"
+
+    def __init__(self):
+        self.texts = []
+
+    def register_source(self, watermark_func=None):
+        return 1
+
+    def write(self, chunk):
+        self.texts.append(chunk.text)
+
+    def checkpoint(self):
+        pass
+
+
+@pytest.fixture
+def audio_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, "FileAudioDecoder", _FakeDecoder)
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"audio")
+    return str(path)
+
+
+def _transcriber(tmp_path, writer, ai_model) -> transcriber.Transcriber:
+    config = TranscriberConfig(recogniser_name="whisper", tmp_directory=str(tmp_path), use_ai=True,
+                               model_name="base", transcription_index=0, speaker_name="", file_workers=1)
+    return transcriber.Transcriber(writer, config, ai_model)
+
+
+def test_segments_get_the_previous_text_as_prompt(tmp_path, audio_file):
+    writer = _CollectingWriter()
+    ai_model = _FakeModel()
+    _transcriber(tmp_path, writer, ai_model).transcribe_file(audio_file)
+
+    assert len(ai_model.prompts) == 5
+    assert ai_model.prompts == [None, "segment 1", "segment 2", "segment 3", "segment 4"]
+    assert writer.texts == [f"segment {number}" for number in range(1, 6)]
+
+
+def test_stop_keeps_the_finished_segments_and_resumes_after_them(tmp_path, audio_file):
+    writer = _CollectingWriter()
+    stopped = _transcriber(tmp_path, writer, None)
+    stopped._ai_model = _FakeModel(on_transcribe=lambda count: count == 2 and stopped.cancel_file())
+    stopped.transcribe_file(audio_file)
+
+    key = stopped._get_file_key(audio_file)
+    assert [result["text"] for result in FileCheckpoint(str(tmp_path), key).load()] == ["segment 1", "segment 2"]
+
+    resumed_model = _FakeModel()
+    resumed_writer = _CollectingWriter()
+    _transcriber(tmp_path, resumed_writer, resumed_model).transcribe_file(audio_file)
+    # the 2 finished segments are written from the checkpoint, the rest continues their text
+    assert len(resumed_model.prompts) == 3
+    assert resumed_model.prompts[0] == "segment 2"
+    assert resumed_writer.texts[:2] == ["segment 1", "segment 2"]
+    assert len(resumed_writer.texts) == 5
@@ -0,0 +1,41 @@
+import os
+
+from transcription_cache import TranscriptionCache
+
+
+def _results(text: str) -> list:
+    return [{"index": 0, "start": 0.0, "end": 60.0, "text": text}]
+
+
+def test_put_and_get(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), 1024 * 1024)
+    assert cache.get("key") is None
+    cache.put("key", _results("hello"))
+
+    assert TranscriptionCache(str(tmp_path), 1024 * 1024).get("key") == _results("hello")
+    assert cache.get("other key") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_size = len('[{"index": 0, "start": 0.0, "end": 60.0, "text": "x"}]')
+    cache = TranscriptionCache(str(tmp_path), entry_size * 2)
+    cache.put("first", _results("x"))
+    cache.put("second", _results("x"))
+    cache_directory = os.path.join(tmp_path, "cache")
+    os.utime(os.path.join(cache_directory, "first.json"), (1000, 1000))
+    os.utime(os.path.join(cache_directory, "second.json"), (2000, 2000))
+    # reading marks the entry as recently used
+    assert cache.get("first") is not None
+
+    cache.put("third", _results("x"))
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), 1024 * 1024)
+    cache.put("key", _results("hello"))
+    with open(os.path.join(tmp_path, "cache", "key.json"), "w", encoding="utf-8") as f:
+        f.write("{")
+    assert cache.get("key") is None
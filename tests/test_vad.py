@@ -0,0 +1,86 @@
+import numpy as np
+
+from vad import VoiceActivityDetector
+
+sampleRate = 16000
+frameLength = 480  # 30 ms frames
+paddingFrames = 6  # 0.2 s padding
+
+
+def _signal(silence_before: float, speech: float, silence_after: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    quiet = lambda seconds: rng.uniform(-0.001, 0.001, int(seconds * sampleRate)).astype(np.float32)
+    t = np.arange(int(speech * sampleRate)) / sampleRate
+    tone = (0.1 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    return np.concatenate((quiet(silence_before), tone, quiet(silence_after)))
+
+
+def _run(vad: VoiceActivityDetector, samples: np.ndarray, block_size: int):
+    segments = []
+    for start in range(0, samples.shape[0], block_size):
+        segments.extend(vad.process(samples[start:start + block_size]))
+    flushed = vad.flush()
+    if flushed is not None:
+        segments.append(flushed)
+    return segments
+
+
+def test_segment_boundaries_include_padding():
+    samples = _signal(1.0, 1.0, 1.0)
+    segments = _run(VoiceActivityDetector(sampleRate, max_segment_duration=30.0), samples, 1600)
+
+    assert len(segments) == 1
+    start, audio = segments[0]
+    # speech starts in frame 33 and ends in frame 66, both are extended by the padding
+    assert start == (33 - paddingFrames) * frameLength
+    assert start + audio.shape[0] == (66 + 1 + paddingFrames) * frameLength
+    np.testing.assert_array_equal(audio, samples[start:start + audio.shape[0]])
+
+
+def test_preroll_is_the_silence_before_the_speech():
+    samples = _signal(1.0, 1.0, 1.0)
+    start, audio = _run(VoiceActivityDetector(sampleRate, max_segment_duration=30.0), samples, 1600)[0]
+
+    preroll = audio[:paddingFrames * frameLength]
+    np.testing.assert_array_equal(preroll, samples[start:start + paddingFrames * frameLength])
+    assert np.abs(preroll).max() <= 0.001
+
+
+def test_segments_dont_depend_on_block_size():
+    samples = _signal(0.7, 1.3, 0.8)
+    expected = _run(VoiceActivityDetector(sampleRate, max_segment_duration=30.0), samples, samples.shape[0])
+
+    for block_size in (100, 480, 1013, 4096):
+        segments = _run(VoiceActivityDetector(sampleRate, max_segment_duration=30.0), samples, block_size)
+        assert [start for start, _ in segments] == [start for start, _ in expected]
+        for (_, audio), (_, expected_audio) in zip(segments, expected):
+            np.testing.assert_array_equal(audio, expected_audio)
+
+
+def test_long_speech_is_split_at_max_duration():
+    samples = _signal(0.5, 2.0, 0.5)
+    segments = _run(VoiceActivityDetector(sampleRate, max_segment_duration=0.6), samples, 1600)
+
+    assert len(segments) > 1
+    # a segment holds the padding and at most max_segment_duration of audio
+    assert all(audio.shape[0] <= (paddingFrames + 20) * frameLength for _, audio in segments)
+    # the segments follow each other without gaps or overlaps
+    for (start, audio), (next_start, _) in zip(segments, segments[1:]):
+        assert start + audio.shape[0] == next_start
+
+
+def test_silence_gives_no_segments():
+    samples = _signal(2.0, 0.0, 0.0)
+    vad = VoiceActivityDetector(sampleRate, max_segment_duration=30.0)
+    assert _run(vad, samples, 1600) == []
+    assert vad.open_segment_start() is None
+
+
+def test_no_padding():
+    samples = _signal(1.0, 1.0, 1.0)
+    segments = _run(VoiceActivityDetector(sampleRate, max_segment_duration=30.0, padding_duration=0.0), samples, samples.shape[0])
+
+    assert len(segments) == 1
+    start, audio = segments[0]
+    assert start == 33 * frameLength
+    assert start + audio.shape[0] == 67 * frameLength